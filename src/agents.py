@@ -1,11 +1,14 @@
+import asyncio
+import contextlib
+import contextvars
 import functools
+import uuid
+import hashlib
 import json
-from typing import Callable, List, Sequence
-import nest_asyncio
+from typing import Callable, List, Mapping, Sequence
 from omegaconf import OmegaConf
 from pydantic import BaseModel, Field
 from fastai.imports import *
-nest_asyncio.apply()
 import os
 from llama_index.core import (
     Settings,
@@ -21,13 +24,16 @@ from llama_index.core.agent.react.formatter import ReActChatFormatter
 from llama_index.core.agent.react.output_parser import ReActOutputParser
 from llama_index.core.llms import ChatMessage
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import TextNode
 from llama_index.core.objects import ObjectIndex
+from llama_index.core.objects.tool_node_mapping import convert_tool_to_node
 from llama_index.core.output_parsers import PydanticOutputParser
 from llama_index.core.program import LLMTextCompletionProgram, MultiModalLLMCompletionProgram
 from llama_index.core.tools import BaseTool, FunctionTool, QueryEngineTool
-from llama_index.core.tools.types import ToolMetadata
+from llama_index.core.tools.types import AsyncBaseTool, ToolMetadata, ToolOutput, adapt_to_async_tool
 from llama_index.program.openai import OpenAIPydanticProgram
 from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 from llama_index.agent.openai import OpenAIAgent
 
 
@@ -40,8 +46,29 @@ from typing import Sequence, List
 from llama_index.core.base.llms.types import ChatMessage, MessageRole
 from llama_index.core.tools import BaseTool
 from llama_index.llms.openai import OpenAI
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.chat_engine import ContextChatEngine
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any
+import threading
+import time
 import tqdm
 
+from memory import ChatHistory, DEFAULT_TOKEN_LIMIT
+from ingestion import DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_WORKERS, embed_documents, embed_nodes
+from utils import hash_file
+from summaries import DocumentArtifactStore, summarize_nodes
+from vector_store import MemmapVectorStore, build_vector_index, load_vector_index
+from response_cache import SemanticResponseCache
+from scheduler import INTERACTIVE, llm_request_context
+from telemetry import InstrumentedTool, Telemetry
+from llama_index.core.base.llms.types import ChatResponse
+from llama_index.core.chat_engine.types import AgentChatResponse, StreamingAgentChatResponse
+
 class ToolCallingAgent: 
     def __init__(
         self,
@@ -50,66 +77,217 @@ class ToolCallingAgent:
         system_prompt: str = None,
         blueprint: BaseModel = None,
         llm=None,
+        tool_timeout: float = None,
+        max_tool_workers: int = 8,
+        history_token_limit: int = None,
+        history_policy: str = "window",
+        tokenizer: Callable[[str], List] = None,
     ) -> None:
         self._blueprint = PydanticOutputParser(blueprint) if blueprint else None
         self._llm = llm
+        self._tool_timeout = tool_timeout
+        self._max_tool_workers = max_tool_workers
         self._tools = {tool.metadata.name: tool for tool in tools}
+        if history_token_limit is None:
+            # leave a quarter of the context window for the tool schemas and the answer
+            context_window = getattr(getattr(llm, "metadata", None), "context_window", None)
+            history_token_limit = int(context_window * 0.75) if context_window else DEFAULT_TOKEN_LIMIT
+        self._chat_history = ChatHistory(
+            system_prompt=system_prompt,
+            token_limit=history_token_limit,
+            tokenizer=tokenizer,
+            policy=history_policy,
+            llm=llm,
+        )
         if chat_history:
-            chat_history.append([ChatMessage(role="system", content=system_prompt)])
-        else:
-            chat_history = [ChatMessage(role="system", content=system_prompt)]
-        self._chat_history = chat_history 
+            self._chat_history.extend(chat_history)
         
         
     def reset(self) -> None:
-        self._chat_history = []
+        self._chat_history.reset()
         
-    def query(self, message: str) -> str:
-        chat_history = self._chat_history
+    def _user_message(self, message: str) -> ChatMessage:
         if self._blueprint:
             formatted_message = self._blueprint.format(query=message)
         else:
             formatted_message = message
-        chat_history.append(ChatMessage(role="user", content=formatted_message))
-        tools = [tool.metadata.to_openai_tool() for _, tool in self._tools.items()]
+        return ChatMessage(role="user", content=formatted_message)
+
+    def _tool_specs(self) -> List[dict]:
+        return [tool.metadata.to_openai_tool() for _, tool in self._tools.items()]
 
-        ai_message = self._llm.chat(chat_history, tools=tools).message
+    def _start_turn(self, message: str) -> List[dict]:
+        self._chat_history.append(self._user_message(message))
+        return self._tool_specs()
+
+    def query(self, message: str) -> str:
+        chat_history = self._chat_history
+        tools = self._start_turn(message)
+
+        ai_message = self._llm.chat(chat_history.messages, tools=tools).message
         additional_kwargs = ai_message.additional_kwargs
         chat_history.append(ai_message)
 
         tool_calls = additional_kwargs.get("tool_calls", None)
-        # parallel function calling is now supported
-        if tool_calls is not None:
-            for tool_call in tool_calls:
-                function_message = self._call_function(tool_call)
-                chat_history.append(function_message)
-                ai_message = self._llm.chat(chat_history).message
-                chat_history.append(ai_message)
-        self._chat_history.append(ChatMessage(role="assistant", content=ai_message.content))
+        # parallel function calling is now supported: run every call of the turn at once and
+        # ask the model for its answer a single time, once all results are in the history
+        if tool_calls:
+            tool_calls = [self._as_tool_call(tool_call, i) for i, tool_call in enumerate(tool_calls)]
+            executor = ThreadPoolExecutor(max_workers=min(self._max_tool_workers, len(tool_calls)))
+            try:
+                # tools run on worker threads; copy the context so their LLM calls keep the caller's priority
+                futures = [executor.submit(contextvars.copy_context().run, self._call_function, tool_call) for tool_call in tool_calls]
+                deadline = time.monotonic() + self._tool_timeout if self._tool_timeout is not None else None
+                for tool_call, future in zip(tool_calls, futures):
+                    try:
+                        timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+                        function_message = future.result(timeout=timeout)
+                    except FuturesTimeoutError:
+                        # the worker thread cannot be interrupted; its late result is discarded
+                        function_message = self._timeout_message(tool_call)
+                    chat_history.append(function_message)
+            finally:
+                # not waiting: a timed-out tool must not hold up the turn, and calls not started yet are dropped
+                executor.shutdown(wait=False, cancel_futures=True)
+            ai_message = self._llm.chat(chat_history.messages).message
+            chat_history.append(ai_message)
         return ai_message.content
-    
-    def _call_function(self, tool_call: ChatCompletionMessageToolCall) -> ChatMessage:
-        id_ = tool_call.id
-        function_call = tool_call.function
-        tool = self._tools[function_call.name]
-        output = tool(**json.loads(function_call.arguments))
+
+    async def aquery(self, message: str) -> str:
+        """Async version of query: the tool calls of a turn are dispatched together with asyncio.gather."""
+        chat_history = self._chat_history
+        # the history is only ever extended through its async methods here, so summarizing never blocks the loop
+        await chat_history.aappend(self._user_message(message))
+        tools = self._tool_specs()
+
+        ai_message = (await self._llm.achat(chat_history.messages, tools=tools)).message
+        additional_kwargs = ai_message.additional_kwargs
+        await chat_history.aappend(ai_message)
+
+        tool_calls = additional_kwargs.get("tool_calls", None)
+        if tool_calls:
+            tool_calls = [self._as_tool_call(tool_call, i) for i, tool_call in enumerate(tool_calls)]
+            function_messages = await asyncio.gather(
+                *[self._acall_function_with_timeout(tool_call) for tool_call in tool_calls]
+            )
+            await chat_history.aextend(function_messages)
+            ai_message = (await self._llm.achat(chat_history.messages)).message
+            await chat_history.aappend(ai_message)
+        return ai_message.content
+
+    @staticmethod
+    def _as_tool_call(tool_call: Any, index: int) -> ChatCompletionMessageToolCall:
+        """Reads a tool call in OpenAI's format or in Ollama's, a dict without id whose arguments are a dict."""
+        if not isinstance(tool_call, Mapping):
+            return tool_call
+        function = tool_call["function"]
+        arguments = function["arguments"]
+        return ChatCompletionMessageToolCall(
+            id=tool_call.get("id") or f"call_{index}",
+            type="function",
+            function=Function(
+                name=function["name"],
+                arguments=arguments if isinstance(arguments, str) else json.dumps(arguments),
+            ),
+        )
+
+    def _function_message(self, tool_call: ChatCompletionMessageToolCall, content: str) -> ChatMessage:
         return ChatMessage(
-            name=function_call.name,
-            content=str(output),
+            name=tool_call.function.name,
+            content=content,
             role="tool",
             additional_kwargs={
-                "tool_call_id": id_,
-                "name": function_call.name,
+                "tool_call_id": tool_call.id,
+                "name": tool_call.function.name,
             },
         )
+
+    def _timeout_message(self, tool_call: ChatCompletionMessageToolCall) -> ChatMessage:
+        return self._function_message(
+            tool_call, f"Error: tool {tool_call.function.name} timed out after {self._tool_timeout} seconds."
+        )
+
+    def _call_function(self, tool_call: ChatCompletionMessageToolCall) -> ChatMessage:
+        function_call = tool_call.function
+        tool = self._tools[function_call.name]
+        output = tool(**json.loads(function_call.arguments))
+        return self._function_message(tool_call, str(output))
+
+    async def _acall_function(self, tool_call: ChatCompletionMessageToolCall) -> ChatMessage:
+        function_call = tool_call.function
+        tool = adapt_to_async_tool(self._tools[function_call.name])
+        output = await tool.acall(**json.loads(function_call.arguments))
+        return self._function_message(tool_call, str(output))
+
+    async def _acall_function_with_timeout(self, tool_call: ChatCompletionMessageToolCall) -> ChatMessage:
+        try:
+            return await asyncio.wait_for(self._acall_function(tool_call), timeout=self._tool_timeout)
+        except asyncio.TimeoutError:
+            return self._timeout_message(tool_call)
         
 
+class LazyDocumentTool(AsyncBaseTool):
+    """
+    Tool proxy for one document. Holds only the tool metadata; the document's indexes, query
+    engines and sub-agent are built by materialize the first time the top agent selects it.
+    """
+
+    def __init__(self, metadata: ToolMetadata, materialize: Callable[[], Any]) -> None:
+        self._metadata = metadata
+        self._materialize = materialize
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self._metadata
+
+    def _get_query_str(self, *args, **kwargs) -> str:
+        if args:
+            return str(args[0])
+        if "input" in kwargs:
+            return str(kwargs["input"])
+        raise ValueError("Cannot call a document tool without an input.")
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        query_str = self._get_query_str(*args, **kwargs)
+        response = self._materialize().query(query_str)
+        return ToolOutput(
+            content=str(response),
+            tool_name=self.metadata.name,
+            raw_input={"input": query_str},
+            raw_output=response,
+        )
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        query_str = self._get_query_str(*args, **kwargs)
+        # building a document's engines reads its index from disk; keep that off the event loop
+        agent = await asyncio.to_thread(self._materialize)
+        response = await agent.aquery(query_str)
+        return ToolOutput(
+            content=str(response),
+            tool_name=self.metadata.name,
+            raw_input={"input": query_str},
+            raw_output=response,
+        )
+
+
 class YoutubeAgent():
     """
     Based on Multi-Document Agents from llama-index:
     https://docs.llamaindex.ai/en/stable/examples/agent/multi_document_agents/
+
+    retrieval_mode selects how questions are answered:
+    - 'global': every chunk of every document lives in one corpus-wide vector index (IVF once it
+      is large), tagged with its source video, and a question costs one retrieval plus one LLM call.
+    - 'agents': one vector/summary sub-agent per document, routed by a ReAct top agent.
     """ 
 
+    MANIFEST_FILE = 'manifest.json'
+    GLOBAL_INDEX_DIR = '_global_index'
+    SUMMARIES_DIR = '_summaries'
+    METADATA_DIR = '_metadata'
+    TOOL_INDEX_DIR = '_tool_index'
+    RETRIEVAL_MODES = ('global', 'agents')
+
     def __init__(
         self,
         out_dir: str,
@@ -119,7 +297,21 @@ class YoutubeAgent():
         system_prompt = None,
         file_paths: List = [],
         in_dir: str = '',
+        retrieval_mode: str = 'global',
+        similarity_top_k: int = 5,
+        max_live_agents: int = 8,
+        precompute_summaries: bool = True,
+        llm_workers: int = 4,
+        response_cache: SemanticResponseCache = None,
+        telemetry: Telemetry = None,
     ):
+        if retrieval_mode not in self.RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode must be one of {self.RETRIEVAL_MODES}, got {retrieval_mode}")
+        self.retrieval_mode = retrieval_mode
+        self.similarity_top_k = similarity_top_k
+        self.global_index = None
+        self.global_hashes = {}
+        self.tool_index = None
         self.document_keywords = None
         self.out_dir = out_dir
         self.file_paths = file_paths
@@ -131,8 +323,25 @@ class YoutubeAgent():
         Settings.llm = self.llm
         Settings.embed_model = self.embedding
         self.all_tools = []
+        self.doc_tools = {}
         self.agents = {}
         self.query_engines = {}
+        self.descriptions = {}
+        self.content_hashes = {}
+        self.precompute_summaries = precompute_summaries
+        self.summary_store = DocumentArtifactStore(os.path.join(out_dir, self.SUMMARIES_DIR))
+        self.metadata_store = DocumentArtifactStore(os.path.join(out_dir, self.METADATA_DIR))
+        self.llm_workers = llm_workers
+        self.response_cache = response_cache
+        self.telemetry = telemetry
+        self._synced_keywords = None
+        self.max_live_agents = max_live_agents
+        self._live_documents = OrderedDict()
+        self._agents_lock = threading.RLock()
+        self.manifest = self._load_manifest()
+        # one embedding request carries embed_batch_size chunks
+        self.embed_batch_size = getattr(embedding, 'embed_batch_size', None) or DEFAULT_EMBED_BATCH_SIZE
+        self.embed_workers = DEFAULT_EMBED_WORKERS
         self.in_dir = in_dir
         if system_prompt:
             self.system_prompt = system_prompt
@@ -146,20 +355,87 @@ class YoutubeAgent():
         self.file_paths = []
         self.docs = {}
         self.all_tools = []
+        self.doc_tools = {}
         self.agents = {}
         self.query_engines = {}
+        self.descriptions = {}
+        self.content_hashes = {}
+        self._live_documents = OrderedDict()
+        self.global_index = None
+        self.global_hashes = {}
+        self.tool_index = None
+        shutil.rmtree(self._global_index_dir(), ignore_errors=True)
+        shutil.rmtree(self._tool_index_dir(), ignore_errors=True)
     
     def update_files(self):
-        """Clears the tools and agents and rebuilds new agents with given files and keywords.
-        Parameters: file_paths (List[str]): a list of paths to files document_keywords (str): a comma separated list of descriptive keywords about documents contents
-        max_iterations (int): maximum number of iterations for the ReAct/top agent; eg, 10.Default is 5 times number of documents. """
-        self._reset()
+        """Syncs the tools and agents with the files in in_dir.
+        Only files that were added or whose content changed since the last sync are re-embedded,
+        files that were removed are dropped, and every other sub-agent is kept as is."""
         self.num_docs = len(self.file_paths)
         self._compose_query_engines_and_agents()
-    
+        self._sync_response_cache()
+
+    def rebuild(self):
+        """Clears the tools and agents and rebuilds them from scratch, ignoring the manifest."""
+        self._reset()
+        self.manifest = {}
+        self._compose_query_engines_and_agents()
+        self._sync_response_cache()
 
     def get_top_agent(self):
         return self.top_agent
+
+    @property
+    def corpus_version(self):
+        """Hash of every document's content and of the settings that shape answers; cached answers are scoped by it."""
+        payload = json.dumps([
+            self.retrieval_mode,
+            sorted(self.content_hashes.items()),
+            self.llm_model_name,
+            self.embedding_model_name,
+            self.system_prompt,
+            self.document_keywords,
+            self.similarity_top_k,
+        ], default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def observe_agent(self, name):
+        """Tags the LLM and tool calls made inside the block with agent name, when telemetry is enabled."""
+        if self.telemetry is None:
+            return contextlib.nullcontext()
+        return self.telemetry.agent(name)
+
+    def _instrument(self, tool, is_agent=False):
+        if self.telemetry is None:
+            return tool
+        return InstrumentedTool(tool, self.telemetry, is_agent=is_agent)
+
+    def _sync_response_cache(self):
+        # answers computed on documents that changed or disappeared must not be served again
+        if self.response_cache is not None:
+            self.response_cache.retain(self.corpus_version)
+
+    def global_filters(self, videos: List[str] = None):
+        """Returns metadata filters restricting global retrieval to the given video titles."""
+        if not videos:
+            return None
+        return MetadataFilters(filters=[MetadataFilter(key='video', value=list(videos), operator=FilterOperator.IN)])
+
+    def global_chat_engine(self, memory=None, videos: List[str] = None):
+        """Returns a chat engine doing a single retrieval over the global index per turn."""
+        return ContextChatEngine.from_defaults(
+            retriever=self.global_index.as_retriever(
+                similarity_top_k=self.similarity_top_k,
+                filters=self.global_filters(videos),
+            ),
+            llm=self.llm,
+            memory=memory,
+            system_prompt=self.system_prompt,
+        )
+
+    def new_session(self, memory=None):
+        """Returns a per-session chat wrapper that shares this agent's tools and indexes."""
+        return YoutubeSession(self, memory=memory)
     
     def list_all_files(self, directory):
         file_list = []
@@ -168,29 +444,322 @@ class YoutubeAgent():
                 file_list.append(os.path.join(root, file))
         return file_list
 
+    @staticmethod
+    def file_title(file_path):
+        return Path(file_path).stem.replace('-', '_').replace(' ', '_')
+
+    @property
+    def llm_model_name(self):
+        return getattr(self.llm, 'model', None) or type(self.llm).__name__
+
+    @property
+    def embedding_model_name(self):
+        return getattr(self.embedding, 'model_name', None) or type(self.embedding).__name__
+
+    def _manifest_path(self):
+        return os.path.join(self.out_dir, self.MANIFEST_FILE)
+
+    def _load_manifest(self):
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        return {}
+
+    def _save_manifest(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _manifest_entry(self, file_path):
+        """Returns the manifest entry for file_path, hashing the file only when its mtime or size moved."""
+        stat = os.stat(file_path)
+        entry = self.manifest.get(file_path)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            content_hash = entry['hash']
+        else:
+            content_hash = hash_file(file_path)
+        return {
+            'title': self.file_title(file_path),
+            'hash': content_hash,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'embed_model': self.embedding_model_name,
+        }
+
+    def _is_stale(self, file_path, entry):
+        previous = self.manifest.get(file_path)
+        return (
+            previous is None
+            or previous['hash'] != entry['hash']
+            or previous['embed_model'] != entry['embed_model']
+        )
+
+    def _drop_document(self, file_title):
+        self.doc_tools.pop(file_title, None)
+        self.descriptions.pop(file_title, None)
+        self._evict_agent(file_title)
+        if self.global_index is not None and self.global_hashes.pop(file_title, None) is not None:
+            store = self.global_index.vector_store
+            node_ids = [node_id for node_id, meta in zip(store.node_ids, store.metadata) if meta.get('video') == file_title]
+            self.global_index.delete_nodes(node_ids, delete_from_docstore=True)
+
+    def _global_index_dir(self):
+        return os.path.join(self.out_dir, self.GLOBAL_INDEX_DIR)
+
+    def _load_global_index(self):
+        if self.global_index is not None:
+            return
+        if MemmapVectorStore.exists(self._global_index_dir()):
+            self.global_index = load_vector_index(self._global_index_dir())
+        else:
+            self.global_index = build_vector_index([], self._global_index_dir())
+        store = self.global_index.vector_store
+        self.global_hashes = {meta.get('video'): meta.get('content_hash') for meta in store.metadata}
+
+    def _is_loaded(self, entry):
+        if self.retrieval_mode == 'global':
+            return self.global_hashes.get(entry['title']) == entry['hash']
+        # tool descriptions depend on document_keywords, so changing them re-describes every document
+        return entry['title'] in self.doc_tools and self._synced_keywords == self.document_keywords
+
+    def _needs_nodes(self, entry, stale):
+        if self.retrieval_mode == 'global' or stale:
+            return True
+        # 'global' mode never writes per-document indexes, so documents it indexed have none on disk yet
+        return not os.path.exists(os.path.join(self.out_dir, entry['title']))
+
     def _compose_query_engines_and_agents(self):
         all_files = self.list_all_files(self.in_dir)
         self.file_paths = all_files
         print(self.file_paths)
+
+        if self.retrieval_mode == 'global':
+            self._load_global_index()
+
+        changed = False
+        for file_path in set(self.manifest) - set(all_files):
+            file_title = self.manifest.pop(file_path)['title']
+            self._drop_document(file_title)
+            self.content_hashes.pop(file_title, None)
+            self.summary_store.remove(file_title)
+            self.metadata_store.remove(file_title)
+            self.docs.pop(file_path, None)
+            shutil.rmtree(os.path.join(self.out_dir, file_title), ignore_errors=True)
+            changed = True
+
+        pending = {}
         for file_path in self.file_paths:
-            doc = SimpleDirectoryReader(input_files=[file_path]).load_data()
-            self.docs[file_path] = doc
-            nodes = self.node_parser.get_nodes_from_documents(doc)
-            file_title = Path(file_path).stem
-            file_title = file_title.replace('-', '_').replace(' ', '_')
-            doc_index_dir = os.path.join(self.out_dir, file_title)
-            vector_index = None
-            if not os.path.exists(doc_index_dir):
-                vector_index = VectorStoreIndex(nodes)
-                vector_index.storage_context.persist(persist_dir=doc_index_dir)
+            entry = self._manifest_entry(file_path)
+            stale = self._is_stale(file_path, entry)
+            self.content_hashes[entry['title']] = entry['hash']
+            if not stale and self._is_loaded(entry):
+                self.manifest[file_path] = entry
+                continue
+            pending[file_path] = (entry, stale)
+
+        # parse every pending file first so that new chunks are embedded together in large batches
+        # unchanged documents in 'agents' mode only need a tool proxy, their index stays on disk until used
+        nodes_by_file = {
+            file_path: self._load_nodes(file_path, entry) if self._needs_nodes(entry, stale) else None
+            for file_path, (entry, stale) in pending.items()
+        }
+        summaries = {}
+        if self.precompute_summaries:
+            summaries = self._map_pending(
+                lambda file_path, entry: self._ensure_summary(file_path, entry, nodes_by_file[file_path]),
+                pending,
+            )
+        descriptions = {}
+        if self.document_keywords and self.retrieval_mode == 'agents':
+            descriptions = self._map_pending(
+                lambda file_path, entry: self._extract_metadata(file_path, entry, nodes_by_file[file_path], summaries.get(file_path)),
+                pending,
+            )
+        if self.retrieval_mode == 'global':
+            # one extra node per video so that holistic questions retrieve its summary
+            for file_path, summary in summaries.items():
+                nodes_by_file[file_path] = nodes_by_file[file_path] + [self._summary_node(pending[file_path][0], summary)]
+        # per-document indexes of unchanged files are loaded from disk, the global index needs every pending node
+        embed_documents(
+            {
+                file_path: nodes
+                for file_path, nodes in nodes_by_file.items()
+                if nodes is not None
+            },
+            self.embedding,
+            batch_size=self.embed_batch_size,
+            num_workers=self.embed_workers,
+        )
+        for file_path, (entry, stale) in pending.items():
+            if self.retrieval_mode == 'global':
+                self._compose_global_document(entry, nodes_by_file[file_path])
+                if stale:
+                    # the per-document index is out of date as well; 'agents' mode will rebuild it
+                    shutil.rmtree(os.path.join(self.out_dir, entry['title']), ignore_errors=True)
             else:
-                storage_context = StorageContext.from_defaults(persist_dir=doc_index_dir)
-                vector_index = load_index_from_storage(storage_context=storage_context)
-                # build summary index            
-            summary_index = SummaryIndex(nodes)
-            # define query engines            
+                self._compose_document(file_path, nodes_by_file[file_path], rebuild_index=stale, file_description=descriptions.get(file_path, ""))
+            self.manifest[file_path] = entry
+            changed = True
+
+        if self.retrieval_mode == 'global':
+            self._save_manifest()
+            if changed:
+                self.global_index.storage_context.persist(persist_dir=self._global_index_dir())
+            if not self.global_hashes:
+                raise Exception('no documents are available!')
+            if changed or not hasattr(self, 'top_agent'):
+                self.top_agent = self.global_chat_engine()
+            return
+
+        self._synced_keywords = self.document_keywords
+        self.all_tools = list(self.doc_tools.values())
+        if self.all_tools == []:
+            raise Exception('no tools are available!')
+        self._save_manifest()
+        if changed or not hasattr(self, 'top_agent'):
+            self._compose_top_agent()
+
+    def _load_nodes(self, file_path, entry):
+        doc = SimpleDirectoryReader(input_files=[file_path]).load_data()
+        for page in doc:
+            # tag every chunk with its source video; the tags take no part in the embedding
+            page.metadata['video'] = entry['title']
+            page.metadata['content_hash'] = entry['hash']
+            page.excluded_embed_metadata_keys.extend(['video', 'content_hash'])
+            page.excluded_llm_metadata_keys.append('content_hash')
+        self.docs[file_path] = doc
+        return self.node_parser.get_nodes_from_documents(doc)
+
+    def _summary_key(self, content_hash):
+        return DocumentArtifactStore.make_key(content_hash, self.llm_model_name)
+
+    def get_summary(self, file_title):
+        """Returns the precomputed summary of a document, or None if it has none for its current content."""
+        content_hash = self.content_hashes.get(file_title)
+        if content_hash is None:
+            return None
+        return self.summary_store.get(file_title, self._summary_key(content_hash))
+
+    def _ensure_summary(self, file_path, entry, nodes=None):
+        summary = self.summary_store.get(entry['title'], self._summary_key(entry['hash']))
+        if summary is None:
+            if nodes is None:
+                nodes = self._load_nodes(file_path, entry)
+            summary = summarize_nodes(entry['title'], nodes, self.llm)
+            self.summary_store.put(entry['title'], self._summary_key(entry['hash']), summary)
+        return summary
+
+    def _map_pending(self, fn, pending):
+        """Runs fn(file_path, entry) for every pending file on at most llm_workers threads."""
+        with ThreadPoolExecutor(max_workers=self.llm_workers) as executor:
+            futures = {file_path: executor.submit(fn, file_path, entry) for file_path, (entry, _) in pending.items()}
+            return {file_path: future.result() for file_path, future in futures.items()}
+
+    def _extract_metadata(self, file_path, entry, nodes=None, summary=None):
+        """Returns the tool description of a document for document_keywords, reusing the persisted
+        extraction when the content hash, keywords and LLM model are unchanged."""
+        key = DocumentArtifactStore.make_key(entry['hash'], self.document_keywords, self.llm_model_name)
+        file_description = self.metadata_store.get(entry['title'], key)
+        if file_description is not None:
+            return file_description
+        metadata_extraction_query = f"Extract metadata from this document in the format {{metadata1: entity1, metadata2: entity2, ...}} that cover the metadata types: {self.document_keywords}"
+        if summary:
+            # the precomputed summary stands in for a full pass over every chunk
+            message = ChatMessage(role=MessageRole.USER, content=f"{metadata_extraction_query}\n\nDocument summary:\n{summary}")
+            subagent_metadata = self.llm.chat([message]).message.content
+        else:
+            if nodes is None:
+                nodes = self._load_nodes(file_path, entry)
+            summary_query_engine = SummaryIndex(nodes).as_query_engine(llm=self.llm)
+            subagent_metadata = summary_query_engine.query(metadata_extraction_query).response
+        file_description = f"Some of the information in this document include {subagent_metadata}."
+        self.metadata_store.put(entry['title'], key, file_description)
+        return file_description
+
+    def _summary_node(self, entry, summary):
+        return TextNode(
+            text=f"Summary of {entry['title']}: {summary}",
+            metadata={'video': entry['title'], 'content_hash': entry['hash'], 'kind': 'summary'},
+            excluded_embed_metadata_keys=['video', 'content_hash', 'kind'],
+            excluded_llm_metadata_keys=['content_hash', 'kind'],
+        )
+
+    def _compose_global_document(self, entry, nodes):
+        self._drop_document(entry['title'])
+        self.global_index.insert_nodes(nodes)
+        self.global_hashes[entry['title']] = entry['hash']
+
+    def _compose_document(self, file_path, nodes, rebuild_index=False, file_description=""):
+        """Persists the document's vector index if needed and registers a lazy tool for it.
+        The summary index, query engines and sub-agent are only built when the tool is first used."""
+        file_title = self.file_title(file_path)
+        doc_index_dir = os.path.join(self.out_dir, file_title)
+        if rebuild_index or not os.path.exists(doc_index_dir):
+            shutil.rmtree(doc_index_dir, ignore_errors=True)
+            build_vector_index(nodes, doc_index_dir)
+        self._evict_agent(file_title)
+        self.descriptions[file_title] = file_description
+
+        doc_tool = self._instrument(LazyDocumentTool(
+            metadata=ToolMetadata(
+                name=f"agent_expert_in_document_{file_title}",
+                description=(
+                    f"This document contains information about {file_title}. Use"
+                    f" this tool if you want to answer any questions about the document {file_title}. {file_description}\n"
+                ),
+            ),
+            materialize=functools.partial(self.get_agent, file_title),
+        ), is_agent=True)
+        # record per document artifacts
+        self.doc_tools[file_title] = doc_tool
+
+    def get_agent(self, file_title):
+        """Returns the sub-agent of a document, building it if it is not among the live ones."""
+        return self._materialize_document(file_title)['agent']
+
+    def _evict_agent(self, file_title):
+        with self._agents_lock:
+            self.agents.pop(file_title, None)
+            self.query_engines.pop(file_title, None)
+            self._live_documents.pop(file_title, None)
+
+    def _materialize_document(self, file_title, vector_index=None):
+        with self._agents_lock:
+            if file_title in self._live_documents:
+                self._live_documents.move_to_end(file_title)
+                return self._live_documents[file_title]
+            if vector_index is None:
+                vector_index = load_vector_index(os.path.join(self.out_dir, file_title))
+            # define query engines            
             vector_query_engine = vector_index.as_query_engine(llm=Settings.llm)
-            summary_query_engine = summary_index.as_query_engine(llm=Settings.llm)
+            summary_tool_metadata = ToolMetadata(
+                name=f"summary_tool_{file_title}",
+                description=(
+                    "Useful for any requests that require a holistic summary"
+                    f" of EVERYTHING about {file_title}. For questions about"
+                    " more specific sections, please use the vector_tool."
+                ),
+            )
+            summary = self.get_summary(file_title)
+            if summary is not None:
+                # answer from the summary computed at ingest time instead of sending every chunk through the LLM
+                summary_query_engine = None
+
+                def read_summary(input: str = "") -> str:
+                    return summary
+
+                summary_tool = FunctionTool.from_defaults(
+                    fn=read_summary,
+                    name=summary_tool_metadata.name,
+                    description=summary_tool_metadata.description,
+                )
+            else:
+                # build summary index            
+                summary_index = SummaryIndex(vector_index.vector_store.get_nodes())
+                summary_query_engine = summary_index.as_query_engine(llm=Settings.llm)
+                summary_tool = QueryEngineTool(query_engine=summary_query_engine, metadata=summary_tool_metadata)
             query_engine_tools = [
                 QueryEngineTool(
                     query_engine=vector_query_engine,
@@ -199,58 +768,246 @@ class YoutubeAgent():
                         description=("Useful for questions related to specific aspects of" f" {file_title}."),
                     ),
                 ),
-                QueryEngineTool(
-                    query_engine=summary_query_engine,
-                    metadata=ToolMetadata(
-                        name=f"summary_tool_{file_title}",
-                        description=(
-                            "Useful for any requests that require a holistic summary"
-                            f" of EVERYTHING about {file_title}. For questions about"
-                            " more specific sections, please use the vector_tool."
-                        ),
-                    ),
-                ),
+                summary_tool,
             ]
-
-            if self.document_keywords:
-                metadata_extraction_query = f"Extract metadata from this document in the format {{metadata1: entity1, metadata2: entity2, ...}} that cover the metadata types: {self.document_keywords}"
-                subagent_metadata = summary_query_engine.query(metadata_extraction_query).response
-                file_description = f"Some of the information in this document include {subagent_metadata}."
-            else:
-                file_description = ""
+            file_description = self.descriptions.get(file_title, "")
             system_prompt = f"""You are a specialized agent designed to answer queries about document titled {file_title}. {file_description}. You must ALWAYS use ALL the provided tools when answering a question; do NOT rely on prior knowledge."""
-            
-            
-            
-            
             subagent = ReActAgent.from_tools(
-                tools=query_engine_tools,
+                tools=[self._instrument(tool) for tool in query_engine_tools],
                 llm=self.llm,
                 system_prompt=system_prompt,
             )
-            doc_tool = QueryEngineTool(
-                query_engine=subagent,
-                metadata=ToolMetadata(
-                    name=f"agent_expert_in_document_{file_title}",
-                    description=(
-                        f"This document contains information about {file_title}. Use"
-                        f" this tool if you want to answer any questions about the document {file_title}. {file_description}\n"
-                    ),
-                ),
-            )
-            self.all_tools.append(doc_tool)
-            # record per document artifacts
+            document = {
+                'agent': subagent,
+                'summary_query_engine': summary_query_engine,
+                'query_engine': vector_index.as_query_engine(),
+            }
+            self._live_documents[file_title] = document
             self.agents[file_title] = subagent
-            self.query_engines[file_title] = vector_index.as_query_engine()
-        if self.all_tools == []:
-            raise Exception('no tools are available!')
+            self.query_engines[file_title] = document['query_engine']
+            while len(self._live_documents) > self.max_live_agents:
+                evicted, _ = self._live_documents.popitem(last=False)
+                self.agents.pop(evicted, None)
+                self.query_engines.pop(evicted, None)
+            return document
 
-        self.obj_index = ObjectIndex.from_objects(
-            self.all_tools,
-            index_cls=VectorStoreIndex,
-        )
+    def _tool_index_dir(self):
+        return os.path.join(self.out_dir, self.TOOL_INDEX_DIR)
+
+    def _sync_tool_index(self):
+        """Brings the persisted tool-routing index in line with all_tools, embedding only the
+        descriptions of tools that were added or whose description changed."""
+        if self.tool_index is None:
+            if MemmapVectorStore.exists(self._tool_index_dir()):
+                self.tool_index = load_vector_index(self._tool_index_dir())
+            else:
+                self.tool_index = build_vector_index([], self._tool_index_dir())
+        nodes = {}
+        for tool in self.all_tools:
+            node = convert_tool_to_node(tool)
+            # the default node id is a salted hash(); the tool name is stable across processes
+            node.id_ = tool.metadata.name
+            node.metadata['tool_hash'] = hashlib.sha256(node.text.encode('utf-8')).hexdigest()
+            node.excluded_embed_metadata_keys.append('tool_hash')
+            node.excluded_llm_metadata_keys.append('tool_hash')
+            nodes[tool.metadata.name] = node
+        store = self.tool_index.vector_store
+        indexed = {meta['name']: meta.get('tool_hash') for meta in store.metadata}
+        removed = [name for name, tool_hash in indexed.items() if name not in nodes or nodes[name].metadata['tool_hash'] != tool_hash]
+        added = [node for name, node in nodes.items() if indexed.get(name) != node.metadata['tool_hash']]
+        if removed:
+            self.tool_index.delete_nodes(removed, delete_from_docstore=True)
+        if added:
+            embed_nodes(added, self.embedding, batch_size=self.embed_batch_size, num_workers=self.embed_workers)
+            self.tool_index.insert_nodes(added)
+        if removed or added:
+            self.tool_index.storage_context.persist(persist_dir=self._tool_index_dir())
+
+    def _compose_top_agent(self):
+        self._sync_tool_index()
+        self.obj_index = ObjectIndex.from_objects_and_index(self.all_tools, self.tool_index)
         self.top_agent = ReActAgent.from_tools(
             tool_retriever=self.obj_index.as_retriever(),
             system_prompt=self.system_prompt,
             verbose=True,
-        )
\ No newline at end of file
+        )
+
+
+class YoutubeSession():
+    """
+    Per-session view of a shared YoutubeAgent. Only the chat memory lives here; the
+    document indexes, sub-agents and tool retriever belong to the shared agent.
+    """
+
+    def __init__(self, youtube_agent: YoutubeAgent, memory=None):
+        self.youtube_agent = youtube_agent
+        self.memory = memory if memory else ChatMemoryBuffer.from_defaults(llm=youtube_agent.llm)
+        self.session_id = uuid.uuid4().hex
+        self._pending_answer = None
+
+    @contextlib.contextmanager
+    def _request_context(self):
+        # every LLM call of a chat turn, including those of tools and sub-agents, is served before background work
+        with llm_request_context(INTERACTIVE, self.session_id), self.youtube_agent.observe_agent('top_agent'):
+            yield
+
+    def _in_request_context(self, response):
+        # the global chat engine streams lazily: its LLM call only starts once the caller iterates the
+        # response, after _request_context() has exited, so every step of the stream re-enters it.
+        # ReAct writes its stream from a thread or task that already copied the request context.
+        if not isinstance(response, StreamingAgentChatResponse) or response.is_writing_to_memory:
+            return response
+        if response.chat_stream is not None:
+            response.chat_stream = self._sync_stream_in_context(response.chat_stream)
+        if response.achat_stream is not None:
+            response.achat_stream = self._async_stream_in_context(response.achat_stream)
+        return response
+
+    def _sync_stream_in_context(self, stream):
+        while True:
+            with self._request_context():
+                try:
+                    chunk = next(stream)
+                except StopIteration:
+                    return
+            yield chunk
+
+    async def _async_stream_in_context(self, stream):
+        while True:
+            with self._request_context():
+                try:
+                    chunk = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield chunk
+
+    def _cache_scope(self, videos: List[str] = None):
+        return (self.youtube_agent.corpus_version, tuple(sorted(videos or [])))
+
+    def _is_standalone(self):
+        # follow-up questions depend on the conversation, so only first questions go through the cache
+        return self.youtube_agent.response_cache is not None and not self.memory.get_all()
+
+    def _cached_answer(self, query: str, answer: str):
+        self.memory.put(ChatMessage(role=MessageRole.USER, content=query))
+        self.memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+        return AgentChatResponse(response=answer)
+
+    def _cached_stream(self, query: str, answer: str):
+        self._cached_answer(query, answer)
+        chunk = ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=answer), delta=answer)
+
+        async def achat_stream():
+            yield chunk
+
+        return StreamingAgentChatResponse(
+            response=answer,
+            chat_stream=iter([chunk]),
+            achat_stream=achat_stream(),
+            is_writing_to_memory=False,
+        )
+
+    def _lookup(self, query: str, query_embedding, videos: List[str] = None):
+        scope = self._cache_scope(videos)
+        answer = self.youtube_agent.response_cache.lookup(scope, query_embedding)
+        if answer is None:
+            self._pending_answer = (scope, query, query_embedding)
+        return answer
+
+    def cache_answer(self, answer: str) -> None:
+        """Stores the answer of the last standalone question that missed the cache; streaming callers call it once the stream ends."""
+        if self._pending_answer is None:
+            return
+        scope, query, query_embedding = self._pending_answer
+        self._pending_answer = None
+        if answer:
+            self.youtube_agent.response_cache.put(scope, query, query_embedding, answer)
+
+    def _top_agent(self, videos: List[str] = None):
+        if self.youtube_agent.retrieval_mode == 'global':
+            return self.youtube_agent.global_chat_engine(memory=self.memory, videos=videos)
+        # the ReAct runner itself is cheap to build; the expensive part is the shared obj_index
+        return ReActAgent.from_tools(
+            tool_retriever=self.youtube_agent.obj_index.as_retriever(),
+            llm=self.youtube_agent.llm,
+            memory=self.memory,
+            system_prompt=self.youtube_agent.system_prompt,
+            verbose=True,
+        )
+
+    def chat(self, query: str, videos: List[str] = None):
+        """Answers query; in 'global' mode videos optionally restricts retrieval to those video titles."""
+        self._pending_answer = None
+        if self._is_standalone():
+            answer = self._lookup(query, self.youtube_agent.embedding.get_query_embedding(query), videos)
+            if answer is not None:
+                return self._cached_answer(query, answer)
+        with self._request_context():
+            response = self._top_agent(videos).chat(query)
+        self.cache_answer(str(response))
+        return response
+
+    def stream_chat(self, query: str, videos: List[str] = None):
+        """Like chat(), but the returned response yields the final answer token by token from response_gen.
+        Call cache_answer() with the full answer once the stream ends."""
+        self._pending_answer = None
+        if self._is_standalone():
+            answer = self._lookup(query, self.youtube_agent.embedding.get_query_embedding(query), videos)
+            if answer is not None:
+                return self._cached_stream(query, answer)
+        with self._request_context():
+            response = self._top_agent(videos).stream_chat(query)
+        return self._in_request_context(response)
+
+    async def achat(self, query: str, videos: List[str] = None):
+        """Async version of chat(): retrieval, tool calls and LLM calls all run on the caller's event loop."""
+        self._pending_answer = None
+        if self._is_standalone():
+            answer = self._lookup(query, await self.youtube_agent.embedding.aget_query_embedding(query), videos)
+            if answer is not None:
+                return self._cached_answer(query, answer)
+        with self._request_context():
+            response = await self._top_agent(videos).achat(query)
+        self.cache_answer(str(response))
+        return response
+
+    async def astream_chat(self, query: str, videos: List[str] = None):
+        """Async version of stream_chat(); iterate async_response_gen() for the answer tokens."""
+        self._pending_answer = None
+        if self._is_standalone():
+            answer = self._lookup(query, await self.youtube_agent.embedding.aget_query_embedding(query), videos)
+            if answer is not None:
+                return self._cached_stream(query, answer)
+        with self._request_context():
+            response = await self._top_agent(videos).astream_chat(query)
+        return self._in_request_context(response)
+
+    def reset(self) -> None:
+        self.memory.reset()
+        self._pending_answer = None
+
+
+class AgentRegistry():
+    """
+    Process-wide registry of built agents. Each agent is built once, either eagerly at
+    startup or lazily on first use, and shared by all chat sessions.
+    """
+
+    def __init__(self):
+        self._agents = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, factory: Callable[[], YoutubeAgent]) -> YoutubeAgent:
+        """Returns the agent registered under key, building it with factory if needed."""
+        with self._lock:
+            if key not in self._agents:
+                self._agents[key] = factory()
+            return self._agents[key]
+
+    def invalidate(self, key: str = None) -> None:
+        """Drops one agent (or all of them) so that the next get() rebuilds it."""
+        with self._lock:
+            if key is None:
+                self._agents.clear()
+            else:
+                self._agents.pop(key, None)
@@ -7,15 +7,16 @@ from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
 from llama_index.core.tools import QueryEngineTool, ToolMetadata
 from llama_index.core.agent import ReActAgent
 from llama_index.core import Settings
-from llama_index.embeddings.ollama import OllamaEmbedding
+from embeddings import EmbeddingCache, OrpheoOllamaEmbedding
 import os
 from llama_index.core.agent import ReActAgent
 
 from utils import merge_files, list_all_files, rename_files_remove_spaces
 
-ollama_embedding = OllamaEmbedding(
+ollama_embedding = OrpheoOllamaEmbedding(
     model_name="llama3.2",
     ollama_additional_kwargs={"mirostat": 0},
+    cache=EmbeddingCache(),
 )
 
 Settings.llm = llm
@@ -29,6 +30,8 @@ from llama_index.core import (
 )
 
 from llama_index.core.tools import QueryEngineTool, ToolMetadata
+from llama_index.core.node_parser import SentenceSplitter
+from vector_store import build_vector_index, load_vector_index
 
 
 # Example usage:
@@ -36,10 +39,7 @@ if __name__ == "__main__":
     directory_path = './data/youtube'    
     rename_files_remove_spaces(directory_path)
     try:
-        storage_context = StorageContext.from_defaults(
-            persist_dir="./storage/youtube"
-        )
-        index = load_index_from_storage(storage_context)
+        index = load_vector_index("./storage/youtube")
 
         index_loaded = True
     except:
@@ -59,9 +59,9 @@ if __name__ == "__main__":
         docs = SimpleDirectoryReader(
             input_files=[file_path], recursive=True
         ).load_data()
-        index = VectorStoreIndex.from_documents(docs)
-        # persist index
-        index.storage_context.persist(persist_dir="./storage/youtube")
+        nodes = SentenceSplitter().get_nodes_from_documents(docs)
+        # build and persist index
+        index = build_vector_index(nodes, persist_dir="./storage/youtube")
 
         engine = index.as_query_engine()
 
@@ -0,0 +1,89 @@
+"""
+Microbenchmark of the per-call overhead OrpheoOllama adds on top of Ollama.
+
+The ReAct loop makes many short LLM calls per question and only reads the message of each
+response. This compares the former eager formatting, which built every OpenAI object, parsed the
+timestamp with dateutil and generated a random base62 id on each call, against the lazy path of
+`format_ollama_response`, both without and with a consumer reading `raw`.
+
+Usage:
+    python benchmark_llms.py [--calls 20000]
+"""
+import argparse
+import copy
+import timeit
+
+from llama_index.core.base.llms.types import ChatResponse
+from llama_index.core.llms import ChatMessage
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
+
+from llms import convert_to_total_seconds, format_ollama_response, generate_unique_id
+
+
+OLLAMA_RESPONSE = {
+    'model': 'llama3.2',
+    'created_at': '2024-08-01T10:20:30.123456789Z',
+    'message': {'role': 'assistant', 'content': 'Thought: I need to use a tool to help me answer the question.'},
+    'done_reason': 'stop',
+    'done': True,
+    'usage': {'prompt_tokens': 412, 'completion_tokens': 17, 'total_tokens': 429},
+}
+
+
+def make_response():
+    raw = copy.deepcopy(OLLAMA_RESPONSE)
+    return ChatResponse(
+        message=ChatMessage(role=raw['message']['role'], content=raw['message']['content'], additional_kwargs={'tool_calls': []}),
+        raw=raw,
+    )
+
+
+def format_eager(response):
+    """The former format_ollama_response, kept here as the baseline."""
+    if response.message.content == "":
+        response.message.content = None
+    if response.raw['message']['content'] == "":
+        response.raw['message']['content'] = None
+    message = ChatMessage(role=response.message.role, content=response.message.content, additional_kwargs={})
+    raw_message = ChatCompletionMessage(content=response.raw['message']['content'], role=response.raw['message']['role'])
+    usage = CompletionUsage(**response.raw['usage'])
+    raw = ChatCompletion(
+        id=f"chatcmpl-{generate_unique_id(26)}",
+        choices=[Choice(finish_reason=response.raw['done_reason'], index=0, logprobs=None, message=raw_message)],
+        created=convert_to_total_seconds(response.raw['created_at']),
+        model=response.raw['model'],
+        object='chat.completion',
+        usage=usage,
+    )
+    return ChatResponse(message=message, raw=raw)
+
+
+def format_lazy_and_read_usage(response):
+    formatted = format_ollama_response(response)
+    formatted.raw.usage
+    return formatted
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--calls', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    responses = [make_response() for _ in range(args.calls * 3)]
+    batches = iter([responses[i::3] for i in range(3)])
+    candidates = [
+        ('eager (previous)', format_eager),
+        ('lazy, raw unread', format_ollama_response),
+        ('lazy, raw read', format_lazy_and_read_usage),
+    ]
+    # the responses are built up front so that only the formatting itself is timed
+    for name, format_fn in candidates:
+        batch = next(batches)
+        seconds = timeit.timeit(lambda: [format_fn(response) for response in batch], number=1)
+        print(f"{name:<18} {seconds / args.calls * 1e6:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
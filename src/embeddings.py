@@ -0,0 +1,145 @@
+import hashlib
+import json
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.ollama import OllamaEmbedding
+
+from ingestion import DEFAULT_EMBED_BATCH_SIZE
+from sqlite_cache import SQLiteLRUCache
+
+
+DEFAULT_EMBEDDING_CACHE_PATH = "./cache/embeddings.sqlite"
+DEFAULT_EMBEDDING_CACHE_ENTRIES = 500_000
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """
+    Persistent embedding cache backed by a local SQLite file.
+
+    Entries are keyed by a hash of (model name, model options, chunk text) and evicted
+    least-recently-used first once the cache grows past max_entries. Vectors are stored
+    as packed float32 blobs.
+
+    Args:
+        path (str, optional): Location of the SQLite file. Defaults to DEFAULT_EMBEDDING_CACHE_PATH.
+        max_entries (int, optional): Maximum number of cached vectors. Defaults to DEFAULT_EMBEDDING_CACHE_ENTRIES.
+    """
+    def __init__(
+        self,
+        path: str = DEFAULT_EMBEDDING_CACHE_PATH,
+        max_entries: int = DEFAULT_EMBEDDING_CACHE_ENTRIES,
+    ) -> None:
+        super().__init__(path, table="embeddings", value_column="vector", max_entries=max_entries)
+
+    @staticmethod
+    def make_key(model_name: str, model_options: Optional[Dict[str, Any]], text: str) -> str:
+        """
+        Builds the cache key of a chunk.
+
+        Args:
+            model_name (str): The embedding model name.
+            model_options (Dict[str, Any], optional): Options passed to the model, eg. ollama_additional_kwargs.
+            text (str): The chunk text.
+
+        Returns:
+            str: A sha256 hex digest.
+        """
+        payload = json.dumps([model_name, model_options or {}, text], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Returns the cached vectors for the given keys; missing keys are absent from the result."""
+        return {key: array("f", blob).tolist() for key, blob in super().get_many(keys).items()}
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]) -> None:
+        """Stores vectors and evicts the least recently used entries beyond max_entries."""
+        super().put_many({key: array("f", vector).tobytes() for key, vector in vectors.items()})
+
+
+class OrpheoOllamaEmbedding(OllamaEmbedding):
+    """
+    OrpheoOllamaEmbedding is a subclass of OllamaEmbedding that consults an EmbeddingCache before
+    asking Ollama, so re-indexing identical chunks does not cost another embedding call.
+
+    A batch of texts is sent to Ollama's /api/embed in a single request instead of one
+    /api/embeddings request per text.
+
+    Args:
+        model_name (str): The name of the embedding model to use.
+        cache (Optional[EmbeddingCache], optional): The cache to consult. Defaults to None, which disables caching.
+        embed_batch_size (int, optional): Number of texts sent per request. Defaults to DEFAULT_EMBED_BATCH_SIZE.
+        **kwargs (Any): Additional keyword arguments passed to OllamaEmbedding.
+    """
+    _cache: Optional[EmbeddingCache] = PrivateAttr(default=None)
+
+    def __init__(
+        self,
+        model_name: str,
+        cache: Optional[EmbeddingCache] = None,
+        embed_batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OrpheoOllamaEmbedding"
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        return self._cache
+
+    def _cache_keys(self, texts: Sequence[str]) -> List[str]:
+        return [
+            EmbeddingCache.make_key(self.model_name, self.ollama_additional_kwargs, text)
+            for text in texts
+        ]
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        result = self._client.embed(model=self.model_name, input=texts, options=self.ollama_additional_kwargs)
+        return result["embeddings"]
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        result = await self._async_client.embed(model=self.model_name, input=texts, options=self.ollama_additional_kwargs)
+        return result["embeddings"]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._aembed([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self._cache is None:
+            return self._embed(texts)
+        keys = self._cache_keys(texts)
+        found = self._cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            vectors = self._embed([texts[i] for i in missing])
+            computed = {keys[i]: vector for i, vector in zip(missing, vectors)}
+            self._cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self._cache is None:
+            return await self._aembed(texts)
+        keys = self._cache_keys(texts)
+        found = self._cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            vectors = await self._aembed([texts[i] for i in missing])
+            computed = {keys[i]: vector for i, vector in zip(missing, vectors)}
+            self._cache.put_many(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
@@ -0,0 +1,198 @@
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_FACTOR = 0.5
+# longest exponential backoff between two attempts
+DEFAULT_BACKOFF_MAX = 60.0
+# longest Retry-After a request waits for; beyond it the 429/503 response is handed back
+DEFAULT_MAX_RETRY_AFTER = 120.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# API requests per second and burst size of each platform
+PLATFORM_RATE_LIMITS = {
+    'tiktok': (10.0, 10),
+    # Instagram Basic Display allows 200 calls per user and hour
+    'instagram': (200 / 3600, 20),
+}
+# hosts the rate limit applies to; media downloads from the CDNs are not limited
+PLATFORM_API_PREFIXES = {
+    'tiktok': ('https://open.tiktokapis.com/',),
+    'instagram': ('https://graph.instagram.com/', 'https://api.instagram.com/'),
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a token is available.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (int): Maximum number of tokens, ie. the allowed burst.
+    """
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedRetry(Retry):
+    """
+    urllib3 Retry that takes a token of bucket before every retried attempt, so retries count
+    against the rate limit like first attempts do, and that gives up instead of sleeping when the
+    server asks to retry after more than max_retry_after seconds.
+
+    Args:
+        bucket (TokenBucket, optional): The bucket retried attempts wait on. Defaults to None.
+        max_retry_after (float, optional): Longest Retry-After waited for. Defaults to DEFAULT_MAX_RETRY_AFTER.
+        **kwargs: Retry arguments.
+    """
+    def __init__(
+        self,
+        *args,
+        bucket: Optional[TokenBucket] = None,
+        max_retry_after: float = DEFAULT_MAX_RETRY_AFTER,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.bucket = bucket
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs) -> "RateLimitedRetry":
+        # Retry.new only forwards the standard arguments
+        retry = super().new(**kwargs)
+        retry.bucket = self.bucket
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry_after = self.get_retry_after(response) if response is not None else None
+        if retry_after is not None and retry_after > self.max_retry_after:
+            print(f"{url}: the server asks to retry after {retry_after:.0f}s, more than {self.max_retry_after:.0f}s; giving up")
+            raise MaxRetryError(_pool, url, ResponseError(f"Retry-After {retry_after:.0f}s exceeds {self.max_retry_after:.0f}s"))
+        return super().increment(method, url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace)
+
+    def sleep(self, response=None) -> None:
+        super().sleep(response)
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that takes a token of bucket before sending a request; retries take theirs in RateLimitedRetry."""
+    def __init__(self, bucket: TokenBucket, **kwargs) -> None:
+        self.bucket = bucket
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.bucket.acquire()
+        return super().send(request, **kwargs)
+
+
+class PlatformSession(requests.Session):
+    """
+    requests.Session shared by every request to one platform.
+
+    Connections are pooled and kept alive, so API pages and media files reuse the TCP+TLS
+    connection of earlier requests. Requests answered with 429 or a 5xx status are retried with
+    exponential backoff, capped at backoff_max, or after Retry-After when the server sends one; a
+    Retry-After beyond max_retry_after hands the response back instead. POST requests are not
+    retried. Every attempt to the api_prefixes, retries included, waits for a token of the
+    platform's bucket; other hosts, eg. media CDNs, are not limited.
+
+    Args:
+        rate (float, optional): API requests per second. Defaults to None, which disables rate limiting.
+        burst (int, optional): Requests allowed in a burst. Defaults to 1.
+        api_prefixes (Sequence[str], optional): URL prefixes of the rate limited API. Defaults to ().
+        pool_connections (int, optional): Number of hosts with a connection pool. Defaults to DEFAULT_POOL_CONNECTIONS.
+        pool_maxsize (int, optional): Connections kept alive per host. Defaults to DEFAULT_POOL_MAXSIZE.
+        max_retries (int, optional): Retries of a failed request. Defaults to DEFAULT_MAX_RETRIES.
+        backoff_factor (float, optional): Backoff base; retry n waits backoff_factor * 2 ** (n - 1) seconds. Defaults to DEFAULT_BACKOFF_FACTOR.
+        backoff_max (float, optional): Longest backoff between two attempts. Defaults to DEFAULT_BACKOFF_MAX.
+        max_retry_after (float, optional): Longest Retry-After waited for. Defaults to DEFAULT_MAX_RETRY_AFTER.
+    """
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        api_prefixes: Sequence[str] = (),
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        max_retry_after: float = DEFAULT_MAX_RETRY_AFTER,
+    ) -> None:
+        super().__init__()
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+        def retry(bucket):
+            return RateLimitedRetry(
+                total=max_retries,
+                backoff_factor=backoff_factor,
+                backoff_max=backoff_max,
+                status_forcelist=RETRY_STATUSES,
+                respect_retry_after_header=True,
+                # hand the last response back to the caller, which already checks status codes
+                raise_on_status=False,
+                bucket=bucket,
+                max_retry_after=max_retry_after,
+            )
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry(None))
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        if self.bucket is not None:
+            api_adapter = RateLimitedAdapter(
+                self.bucket, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry(self.bucket)
+            )
+            for prefix in api_prefixes:
+                self.mount(prefix, api_adapter)
+
+
+_sessions: Dict[str, PlatformSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(platform: str, **kwargs) -> PlatformSession:
+    """
+    Returns the process-wide session of platform, creating it on first use.
+
+    Args:
+        platform (str): A key of PLATFORM_RATE_LIMITS, eg. 'tiktok' or 'instagram'.
+        **kwargs: PlatformSession arguments, used only when the session is created.
+
+    Returns:
+        PlatformSession: The shared session.
+    """
+    with _sessions_lock:
+        if platform not in _sessions:
+            rate, burst = PLATFORM_RATE_LIMITS.get(platform, (None, 1))
+            kwargs.setdefault('rate', rate)
+            kwargs.setdefault('burst', burst)
+            kwargs.setdefault('api_prefixes', PLATFORM_API_PREFIXES.get(platform, ()))
+            _sessions[platform] = PlatformSession(**kwargs)
+        return _sessions[platform]
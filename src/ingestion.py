@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Sequence
+
+from llama_index.core.schema import BaseNode, MetadataMode
+
+
+DEFAULT_EMBED_BATCH_SIZE = 256
+DEFAULT_EMBED_WORKERS = 4
+
+
+def embed_nodes(
+    nodes: Sequence[BaseNode],
+    embed_model,
+    batch_size: Optional[int] = None,
+    num_workers: int = DEFAULT_EMBED_WORKERS,
+) -> Sequence[BaseNode]:
+    """
+    Embeds nodes in batches on a bounded thread pool and stores the vectors on node.embedding.
+
+    Nodes that already carry an embedding are skipped. At most num_workers batches are in
+    flight at a time, so memory stays bounded no matter how many nodes are passed in.
+
+    Args:
+        nodes (Sequence[BaseNode]): The nodes to embed, possibly coming from many documents.
+        embed_model (BaseEmbedding): The embedding model, eg. an OllamaEmbedding.
+        batch_size (int, optional): Number of chunks sent per embedding request, at most the model's
+            embed_batch_size since the model splits larger batches itself. Defaults to embed_model.embed_batch_size.
+        num_workers (int, optional): Maximum number of concurrent embedding requests. Defaults to 4.
+
+    Returns:
+        Sequence[BaseNode]: The same nodes, with their embedding set.
+    """
+    model_batch_size = getattr(embed_model, 'embed_batch_size', None) or DEFAULT_EMBED_BATCH_SIZE
+    batch_size = min(batch_size or model_batch_size, model_batch_size)
+    pending = [node for node in nodes if node.embedding is None]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if not batches:
+        return nodes
+
+    def _embed_batch(batch: List[BaseNode]) -> None:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        vectors = embed_model.get_text_embedding_batch(texts)
+        for node, vector in zip(batch, vectors):
+            node.embedding = vector
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = set()
+        for batch in batches:
+            if len(in_flight) >= num_workers:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            in_flight.add(executor.submit(_embed_batch, batch))
+        for future in in_flight:
+            future.result()
+    return nodes
+
+
+def embed_documents(
+    nodes_by_doc: Dict[str, Sequence[BaseNode]],
+    embed_model,
+    batch_size: Optional[int] = None,
+    num_workers: int = DEFAULT_EMBED_WORKERS,
+) -> Dict[str, Sequence[BaseNode]]:
+    """
+    Embeds the nodes of several documents in shared batches and hands them back per document.
+
+    Args:
+        nodes_by_doc (Dict[str, Sequence[BaseNode]]): Nodes keyed by document.
+        embed_model (BaseEmbedding): The embedding model.
+        batch_size (int, optional): Number of chunks sent per embedding request. Defaults to embed_model.embed_batch_size.
+        num_workers (int, optional): Maximum number of concurrent embedding requests.
+
+    Returns:
+        Dict[str, Sequence[BaseNode]]: The same mapping; every node now carries its embedding.
+    """
+    all_nodes = [node for nodes in nodes_by_doc.values() for node in nodes]
+    embed_nodes(all_nodes, embed_model, batch_size=batch_size, num_workers=num_workers)
+    return nodes_by_doc
@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 import webbrowser
 from datetime import datetime
 from pathlib import Path
@@ -9,6 +8,7 @@ import urllib.parse
 from threading import Thread
 from dotenv import load_dotenv
 from typing import Optional, Dict, List
+from http_session import PlatformSession, get_session
 
 class OAuthCallbackHandler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -30,8 +30,10 @@ class OAuthCallbackHandler(BaseHTTPRequestHandler):
         return
 
 class InstagramDownloader:
-    def __init__(self):
+    def __init__(self, session: Optional[PlatformSession] = None):
         load_dotenv()
+        # pooled, rate limited and retried transport shared by every InstagramDownloader
+        self.session = session or get_session('instagram')
         self.client_id = os.getenv('INSTAGRAM_CLIENT_ID')
         self.client_secret = os.getenv('INSTAGRAM_CLIENT_SECRET')
         self.redirect_uri = "http://localhost:8000/"
@@ -98,7 +100,7 @@ class InstagramDownloader:
             if server.oauth_code:
                 # Exchange code for access token
                 print("Authenticating...")
-                response = requests.post(
+                response = self.session.post(
                     "https://api.instagram.com/oauth/access_token",
                     data={
                         'client_id': self.client_id,
@@ -135,7 +137,7 @@ class InstagramDownloader:
             'access_token': self.access_token
         }
         
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
         return response.json()
 
     def get_user_media(self, limit: Optional[int] = None) -> List[Dict]:
@@ -151,7 +153,7 @@ class InstagramDownloader:
         }
         
         while url and (limit is None or len(media) < limit):
-            response = requests.get(url, params=params)
+            response = self.session.get(url, params=params)
             data = response.json()
             
             if 'data' in data:
@@ -170,7 +172,7 @@ class InstagramDownloader:
     def download_media(self, media_url: str, output_path: str) -> bool:
         """Download media from URL"""
         try:
-            response = requests.get(media_url)
+            response = self.session.get(media_url)
             if response.status_code == 200:
                 with open(output_path, 'wb') as f:
                     f.write(response.content)
@@ -1,16 +1,37 @@
+import asyncio
+import calendar
+import contextlib
+import hashlib
+import itertools
+import json
 import pdb
 import random
+import re
 import string
+import threading
 import uuid
+import weakref
 from datetime import timezone
-from typing import Any, Dict, Optional, Sequence, Union
+from functools import cached_property
+from typing import Any, Dict, List, Literal, Optional, Sequence, Union
 
+import httpx
 from dateutil import parser
+from llama_index.core.base.llms.generic_utils import (
+    achat_to_completion_decorator,
+    astream_chat_to_completion_decorator,
+    chat_to_completion_decorator,
+    stream_chat_to_completion_decorator,
+)
 from llama_index.core.base.llms.types import (
     ChatResponse,
     ChatResponseAsyncGen,
+    ChatResponseGen,
     CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
 )
+from llama_index.core.bridge.pydantic import BaseModel, Field, PrivateAttr
 from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
 from llama_index.core.constants import DEFAULT_CONTEXT_WINDOW
 from llama_index.core.llms import ChatMessage
@@ -19,10 +40,105 @@ from ollama import AsyncClient, Client
 from openai.types.chat import ChatCompletion, ChatCompletionMessage
 from openai.types.chat.chat_completion import Choice
 from openai.types.completion_usage import CompletionUsage
+from pydantic import computed_field
+from scheduler import LLMScheduler
+from sqlite_cache import SQLiteLRUCache
+from telemetry import Telemetry
 from llama_index.llms.azure_openai import AzureOpenAI
 
 
 DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 8
+DEFAULT_KEEPALIVE_EXPIRY = 300.0
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Pooled clients shared by every OrpheoOllama talking to the same server with the same settings.
+# httpx async pools are bound to the event loop that opened them, so async clients are kept per loop.
+_shared_clients: Dict[tuple, Client] = {}
+_shared_async_clients = weakref.WeakKeyDictionary()
+_shared_clients_lock = threading.Lock()
+
+DEFAULT_LLM_CACHE_PATH = "./cache/llm_calls.sqlite"
+DEFAULT_LLM_CACHE_ENTRIES = 100_000
+LLM_CACHE_MODES = ("readwrite", "record", "replay")
+
+
+class LLMCacheMiss(Exception):
+    """Raised by an LLMCallCache in 'replay' mode when a call was never recorded."""
+
+
+class LLMCallCache(SQLiteLRUCache):
+    """
+    Exact-match cache of Ollama chat calls backed by a local SQLite file.
+
+    Entries are keyed by a hash of (model, messages, tools, temperature, options) and evicted
+    least-recently-used first once the cache grows past max_entries. mode selects how it is used:
+    - 'readwrite': answer from the cache when possible, record every miss.
+    - 'record': always call Ollama and overwrite the recorded answer.
+    - 'replay': never call Ollama; a miss raises LLMCacheMiss, so benchmarks can run offline.
+    Streamed calls share the keys of plain calls: a completed stream is recorded as its assembled
+    answer and replayed one word per chunk.
+
+    Args:
+        path (str, optional): Location of the SQLite file. Defaults to DEFAULT_LLM_CACHE_PATH.
+        max_entries (int, optional): Maximum number of cached calls. Defaults to DEFAULT_LLM_CACHE_ENTRIES.
+        mode (str, optional): 'readwrite', 'record' or 'replay'. Defaults to 'readwrite'.
+    """
+    def __init__(
+        self,
+        path: str = DEFAULT_LLM_CACHE_PATH,
+        max_entries: int = DEFAULT_LLM_CACHE_ENTRIES,
+        mode: str = "readwrite",
+    ) -> None:
+        if mode not in LLM_CACHE_MODES:
+            raise ValueError(f"mode must be one of {LLM_CACHE_MODES}, got {mode}")
+        super().__init__(path, table="llm_calls", value_column="response", max_entries=max_entries)
+        self.mode = mode
+
+    @staticmethod
+    def make_key(
+        model: str,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        temperature: float,
+        options: Optional[Dict[str, Any]],
+    ) -> str:
+        """
+        Builds the cache key of a chat call.
+
+        Args:
+            model (str): The model name.
+            messages (List[Dict[str, Any]]): The chat messages, as role/content/additional_kwargs dicts.
+            tools (List[Dict[str, Any]], optional): The tool schemas offered to the model.
+            temperature (float): The sampling temperature.
+            options (Dict[str, Any], optional): Every other option sent to Ollama.
+
+        Returns:
+            str: A sha256 hex digest.
+        """
+        payload = json.dumps([model, messages, tools, temperature, options or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the recorded response of key, or None; in 'replay' mode a miss raises LLMCacheMiss."""
+        if self.mode == "record":
+            return None
+        response = super().get(key)
+        if response is None:
+            if self.mode == "replay":
+                raise LLMCacheMiss(f"no recorded LLM call for key {key} in {self.path}")
+            return None
+        return json.loads(response)
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Records a response and evicts the least recently used entries beyond max_entries."""
+        super().put(key, json.dumps(response, default=str))
 
 
 def convert_to_total_seconds(time_string):
@@ -69,59 +185,186 @@ def generate_unique_id(length=35):
     return base62_id
 
 
+def fast_total_seconds(time_string):
+    """
+    Fast path of `convert_to_total_seconds` for the UTC timestamps Ollama sends, eg. 2024-08-01T10:20:30.123456789Z.
+
+    Only the leading date and time fields are parsed; any other format falls back to `convert_to_total_seconds`.
+
+    Args:
+        time_string (str): A string representing the date and time in ISO 8601 format.
+
+    Returns:
+        int: The total number of seconds since the Unix epoch.
+    """
+    if len(time_string) >= 20 and time_string[-1] == 'Z' and time_string[10] == 'T':
+        try:
+            return calendar.timegm((
+                int(time_string[0:4]), int(time_string[5:7]), int(time_string[8:10]),
+                int(time_string[11:13]), int(time_string[14:16]), int(time_string[17:19]),
+                0, 0, 0,
+            ))
+        except ValueError:
+            pass
+    return convert_to_total_seconds(time_string)
+
+
+# ids only need to be unique, not random: a random per-process prefix and a counter are enough
+_completion_id_prefix = generate_unique_id(14)
+_completion_id_counter = itertools.count()
+
+
+def next_completion_id():
+    """
+    Returns a unique `chatcmpl-` identifier without generating a random id for every call.
+
+    Returns:
+        str: An identifier of the form chatcmpl-<14 random characters><12 digit counter>.
+    """
+    return f"chatcmpl-{_completion_id_prefix}{next(_completion_id_counter):012d}"
+
+
+def build_choices(raw):
+    """
+    Builds the OpenAI-compatible choices of a raw Ollama chat response.
+
+    Args:
+        raw (dict): The raw Ollama response, with `message` and `done_reason`.
+
+    Returns:
+        List[Choice]: A single choice holding the message.
+    """
+    raw_message = ChatCompletionMessage(
+        content=raw['message']['content'] or None,
+        role=raw['message']['role'],
+    )
+    return [Choice(finish_reason=raw['done_reason'], index=0, logprobs=None, message=raw_message)]
+
+
+def build_usage(raw):
+    """
+    Builds the OpenAI-compatible usage of a raw Ollama chat response.
+
+    Args:
+        raw (dict): The raw Ollama response, optionally with `usage`.
+
+    Returns:
+        Optional[CompletionUsage]: The token counts, or None when Ollama sent none.
+    """
+    return CompletionUsage(**raw['usage']) if raw.get('usage') else None
+
+
+class LazyChatCompletion(BaseModel):
+    """
+    OpenAI-compatible completion of a raw Ollama response whose choices and usage are built on first access.
+
+    Most callers (eg. the ReAct loop) only read the message of a response, so the id, timestamp and
+    model are set when the completion is created and `choices` and `usage`, the nested pydantic
+    objects, are cached properties built when something reads them. Both are computed fields:
+    `model_dump()` and `model_dump_json()`, eg. through `ChatResponse.model_dump_json()`, build them
+    and have the shape of a `ChatCompletion`. `to_chat_completion()` returns a real one.
+    """
+    id: str
+    created: int
+    model: str
+    object: Literal['chat.completion'] = 'chat.completion'
+    service_tier: Optional[str] = None
+    system_fingerprint: Optional[str] = None
+    _ollama_response: Any = PrivateAttr(default=None)
+
+    @classmethod
+    def from_ollama_response(cls, raw):
+        """
+        Wraps a raw Ollama response; only the id, creation timestamp and model are read.
+
+        Args:
+            raw (dict): The raw Ollama response.
+
+        Returns:
+            LazyChatCompletion: The completion, with choices and usage not built yet.
+        """
+        completion = cls(id=next_completion_id(), created=fast_total_seconds(raw['created_at']), model=raw['model'])
+        completion._ollama_response = raw
+        return completion
+
+    @property
+    def ollama_response(self):
+        """The raw Ollama response the completion is built from."""
+        return self._ollama_response
+
+    @computed_field
+    @cached_property
+    def choices(self) -> List[Choice]:
+        return build_choices(self._ollama_response)
+
+    @computed_field
+    @cached_property
+    def usage(self) -> Optional[CompletionUsage]:
+        return build_usage(self._ollama_response)
+
+    def to_chat_completion(self) -> ChatCompletion:
+        """Returns the completion as an openai `ChatCompletion`."""
+        return ChatCompletion(
+            id=self.id,
+            choices=self.choices,
+            created=self.created,
+            model=self.model,
+            object=self.object,
+            usage=self.usage,
+        )
+
+
 def format_ollama_response(response):
     """
-    Formats a response from the Ollama API into structured chat and completion messages.
+    Formats a response from the Ollama API into a structured chat response.
 
-    The function extracts information from the given response, formats it into `ChatMessage` and `ChatCompletion`
-    objects, and then wraps these objects into a `ChatResponse`.
-    - `ChatMessage`: Contains the role and content of the message.
-    - `ChatCompletionMessage`: Contains the raw content and role of the message.
-    - `CompletionUsage`: Contains usage statistics from the response.
-    - `ChatCompletion`: Contains the completion ID, choices, creation timestamp, model, object type, and usage.
-    - `ChatResponse`: Contains the formatted `ChatMessage` and `ChatCompletion`.
+    The message is normalized in place: empty content becomes None and `additional_kwargs` only
+    keeps the model's `tool_calls`, in Ollama's format so that they can be sent back in the history.
+    `raw` becomes a `LazyChatCompletion`, whose OpenAI-compatible choices and usage are only built when a
+    consumer reads them.
 
     Args:
         response (OllamaResponse): A response object from the Ollama API containing both the message and raw data.
 
     Returns:
-        ChatResponse: A structured response consisting of a formatted chat message and raw completion data.
+        ChatResponse: A structured response consisting of a formatted chat message and lazily built raw completion data.
     """
     if response.message.content == "":
         response.message.content = None
+    tool_calls = response.message.additional_kwargs.get('tool_calls')
+    response.message.additional_kwargs = {'tool_calls': tool_calls} if tool_calls else {}
+    response.raw = LazyChatCompletion.from_ollama_response(response.raw)
+    return response
 
-    if response.raw['message']['content'] == "":
-        response.raw['message']['content'] = None
 
-    message = ChatMessage(
-        role=response.message.role,
-        content=response.message.content,
-        additional_kwargs={}
-    )
+def format_ollama_stream_chunk(response):
+    """
+    Normalizes one chunk of a streamed Ollama chat response.
 
-    raw_message = ChatCompletionMessage(
-        content=response.raw['message']['content'],
-        role=response.raw['message']['role'],
-    )
+    Intermediate chunks keep the accumulated message and the new `delta`, without a raw payload. The
+    final chunk (`done` is set by Ollama) is formatted like a non-streamed response by
+    `format_ollama_response`, so consumers find the full content, finish reason and usage on it.
 
-    usage = CompletionUsage(**response.raw['usage'])
-
-    raw = ChatCompletion(
-        id=f"chatcmpl-{generate_unique_id(26)}",
-        choices=[
-            Choice(
-                finish_reason=response.raw['done_reason'],
-                index=0,
-                logprobs=None,
-                message=raw_message,
-            )
-        ],
-        created=convert_to_total_seconds(response.raw['created_at']),
-        model=response.raw['model'],
-        object='chat.completion',
-        usage=usage,
-    )
-    return ChatResponse(message=message, raw=raw)
+    Args:
+        response (ChatResponse): A chunk yielded by Ollama.stream_chat or Ollama.astream_chat.
+
+    Returns:
+        ChatResponse: The normalized chunk.
+    """
+    if not response.raw.get('done'):
+        return ChatResponse(
+            message=ChatMessage(
+                role=response.message.role,
+                content=response.message.content,
+                additional_kwargs=response.message.additional_kwargs,
+            ),
+            delta=response.delta,
+        )
+    # the final chunk's raw message only holds the last delta; report the whole answer instead
+    response.raw['message']['content'] = response.message.content
+    formatted = format_ollama_response(response)
+    formatted.delta = response.delta
+    return formatted
 
 
 class OrpheoOllama(Ollama):
@@ -141,8 +384,35 @@ class OrpheoOllama(Ollama):
         async_client (Optional[AsyncClient], optional): The client for asynchronous requests. Defaults to None.
         is_function_calling_model (bool, optional): Whether the model supports function calling. Defaults to True.
         keep_alive (Optional[Union[float, str]], optional): The keep-alive setting. Defaults to None.
+        max_connections (int, optional): Maximum number of open HTTP connections to Ollama. Defaults to DEFAULT_MAX_CONNECTIONS.
+        max_keepalive_connections (int, optional): Maximum number of idle connections kept open. Defaults to DEFAULT_MAX_KEEPALIVE_CONNECTIONS.
+        keepalive_expiry (float, optional): Seconds an idle connection is kept open. Defaults to DEFAULT_KEEPALIVE_EXPIRY.
+        http2 (bool, optional): Whether to negotiate HTTP/2; only used when the h2 package is installed. Defaults to True.
+        call_cache (Optional[LLMCallCache], optional): Exact-match cache of chat calls. Defaults to None, which disables caching.
+        scheduler (Optional[LLMScheduler], optional): Admission queue every call to Ollama waits in. Defaults to None, which sends calls right away.
+        telemetry (Optional[Telemetry], optional): Records the tokens and latency of every call to Ollama. Defaults to None.
         **kwargs (Any): Additional keyword arguments.
     """
+    max_connections: int = Field(
+        default=DEFAULT_MAX_CONNECTIONS,
+        description="Maximum number of open HTTP connections to Ollama.",
+    )
+    max_keepalive_connections: int = Field(
+        default=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        description="Maximum number of idle connections kept open.",
+    )
+    keepalive_expiry: float = Field(
+        default=DEFAULT_KEEPALIVE_EXPIRY,
+        description="Seconds an idle connection is kept open.",
+    )
+    http2: bool = Field(
+        default=True,
+        description="Whether to negotiate HTTP/2 when the h2 package is installed.",
+    )
+    _call_cache: Optional[LLMCallCache] = PrivateAttr(default=None)
+    _scheduler: Optional[LLMScheduler] = PrivateAttr(default=None)
+    _telemetry: Optional[Telemetry] = PrivateAttr(default=None)
+
     def __init__(
         self,
         model: str,
@@ -156,6 +426,13 @@ class OrpheoOllama(Ollama):
         async_client: Optional[AsyncClient] = None,
         is_function_calling_model: bool = True,
         keep_alive: Optional[Union[float, str]] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: bool = True,
+        call_cache: Optional[LLMCallCache] = None,
+        scheduler: Optional[LLMScheduler] = None,
+        telemetry: Optional[Telemetry] = None,
         **kwargs: Any,
     ) -> None:
         """Initializes the OrpheoOllama instance with the provided parameters."""
@@ -173,6 +450,139 @@ class OrpheoOllama(Ollama):
             keep_alive=keep_alive,
             kwargs=kwargs,
         )
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self._call_cache = call_cache
+        self._scheduler = scheduler
+        self._telemetry = telemetry
+
+    @property
+    def telemetry(self) -> Optional[Telemetry]:
+        return self._telemetry
+
+    def _observe(self, streaming: bool = False):
+        # measured once a slot is granted, so latency is Ollama's; queue time is the scheduler's metric
+        if self._telemetry is None:
+            return contextlib.nullcontext()
+        return self._telemetry.llm_call(self.model, streaming=streaming)
+
+    @property
+    def scheduler(self) -> Optional[LLMScheduler]:
+        return self._scheduler
+
+    def _slot(self):
+        # cache hits never reach Ollama, so only the actual requests wait for a slot
+        return self._scheduler.slot() if self._scheduler is not None else contextlib.nullcontext()
+
+    def _aslot(self):
+        return self._scheduler.aslot() if self._scheduler is not None else contextlib.nullcontext()
+
+    @property
+    def call_cache(self) -> Optional[LLMCallCache]:
+        return self._call_cache
+
+    def _call_cache_key(self, messages: Sequence[ChatMessage], kwargs: Dict[str, Any]) -> str:
+        return LLMCallCache.make_key(
+            self.model,
+            [
+                {"role": message.role.value, "content": message.content, "additional_kwargs": message.additional_kwargs}
+                for message in messages
+            ],
+            kwargs.get("tools"),
+            self.temperature,
+            {**self._model_kwargs, "json_mode": self.json_mode},
+        )
+
+    @staticmethod
+    def _cached_chat_response(cached: Dict[str, Any]) -> ChatResponse:
+        return ChatResponse(
+            message=ChatMessage(
+                role=cached["message"]["role"],
+                content=cached["message"]["content"],
+                additional_kwargs=cached["message"]["additional_kwargs"],
+            ),
+            raw=cached["raw"],
+        )
+
+    @staticmethod
+    def _cacheable(response: ChatResponse) -> Dict[str, Any]:
+        # recorded before format_ollama_response, which rewrites empty content
+        return {
+            "message": {
+                "role": response.message.role.value,
+                "content": response.message.content,
+                "additional_kwargs": response.message.additional_kwargs,
+            },
+            "raw": dict(response.raw),
+        }
+
+    @classmethod
+    def _cached_stream(cls, cached: Dict[str, Any]) -> List[ChatResponse]:
+        # replays a recorded answer as one chunk per word, then the final chunk like Ollama's done chunk
+        chunks, content = [], ""
+        for delta in re.findall(r"\s*\S+\s*", cached["message"]["content"] or ""):
+            content += delta
+            chunks.append(ChatResponse(message=ChatMessage(role=cached["message"]["role"], content=content), delta=delta))
+        final = format_ollama_response(cls._cached_chat_response(cached))
+        final.delta = ""
+        chunks.append(final)
+        return chunks
+
+    def _record_stream(self, key: Optional[str], response: ChatResponse) -> None:
+        # only complete streams are recorded; the done chunk's raw message only holds the last delta
+        if key is None or not response.raw.get('done'):
+            return
+        cacheable = self._cacheable(response)
+        cacheable["raw"]["message"] = {**response.raw["message"], "content": response.message.content}
+        self._call_cache.put(key, cacheable)
+
+    def _client_key(self) -> tuple:
+        return (
+            self.base_url,
+            self.request_timeout,
+            self.max_connections,
+            self.max_keepalive_connections,
+            self.keepalive_expiry,
+            self.http2 and HTTP2_AVAILABLE,
+        )
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {
+            "host": self.base_url,
+            "timeout": self.request_timeout,
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "http2": self.http2 and HTTP2_AVAILABLE,
+        }
+
+    @property
+    def client(self) -> Client:
+        """The pooled synchronous client; one per server and pool settings, shared across instances."""
+        if self._client is None:
+            key = self._client_key()
+            with _shared_clients_lock:
+                if key not in _shared_clients:
+                    _shared_clients[key] = Client(**self._client_kwargs())
+                self._client = _shared_clients[key]
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncClient:
+        """The pooled asynchronous client of the running event loop, shared across instances."""
+        if self._async_client is not None:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        key = self._client_key()
+        with _shared_clients_lock:
+            clients = _shared_async_clients.setdefault(loop, {})
+            if key not in clients:
+                clients[key] = AsyncClient(**self._client_kwargs())
+            return clients[key]
 
     @llm_chat_callback()
     def chat(
@@ -190,7 +600,18 @@ class OrpheoOllama(Ollama):
         Returns:
             ChatResponse: The response from the chat model.
         """
-        response = super().chat(messages, **kwargs)
+        key = None
+        if self._call_cache is not None:
+            key = self._call_cache_key(messages, kwargs)
+            cached = self._call_cache.get(key)
+            if cached is not None:
+                return format_ollama_response(self._cached_chat_response(cached))
+        with self._slot(), self._observe() as call:
+            response = super().chat(messages, **kwargs)
+            if call is not None:
+                call.set_usage(response.raw.get('usage'))
+        if key is not None:
+            self._call_cache.put(key, self._cacheable(response))
         response = format_ollama_response(response)
         return response
 
@@ -212,8 +633,28 @@ class OrpheoOllama(Ollama):
         Returns:
             CompletionResponse: The response from the completion model.
         """
-        response = super().complete(prompt, formatted, **kwargs)
-        return format_ollama_response(response)
+        # chat() already formats the Ollama response; the completion keeps it as its raw payload
+        return chat_to_completion_decorator(self.chat)(prompt, **kwargs)
+
+    @llm_completion_callback()
+    async def acomplete(
+        self,
+        prompt: str,
+        formatted: bool = False,
+        **kwargs: Any
+    ) -> CompletionResponse:
+        """
+        Connector to handle the asynchronous completion requests with Ollama.
+
+        Args:
+            prompt (str): The input prompt for completion.
+            formatted (bool, optional): Whether the response should be formatted. Defaults to False.
+            **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+            CompletionResponse: The response from the completion model.
+        """
+        return await achat_to_completion_decorator(self.achat)(prompt, **kwargs)
 
     @llm_chat_callback()
     async def achat(
@@ -231,9 +672,146 @@ class OrpheoOllama(Ollama):
         Returns:
             ChatResponse: The response from the chat model.
         """
-        response = await super().achat(messages, **kwargs)
+        key = None
+        if self._call_cache is not None:
+            key = self._call_cache_key(messages, kwargs)
+            cached = self._call_cache.get(key)
+            if cached is not None:
+                return format_ollama_response(self._cached_chat_response(cached))
+        async with self._aslot():
+            with self._observe() as call:
+                response = await super().achat(messages, **kwargs)
+                if call is not None:
+                    call.set_usage(response.raw.get('usage'))
+        if key is not None:
+            self._call_cache.put(key, self._cacheable(response))
         return format_ollama_response(response)
 
+    @llm_chat_callback()
+    def stream_chat(
+        self,
+        messages: Sequence[ChatMessage],
+        **kwargs: Any
+    ) -> ChatResponseGen:
+        """
+        Connector to handle the streaming chat requests with Ollama.
+
+        Args:
+            messages (Sequence[ChatMessage]): A sequence of chat messages.
+            **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+            ChatResponseGen: A generator of normalized chunks; the last one carries the usage.
+        """
+        key = None
+        if self._call_cache is not None:
+            key = self._call_cache_key(messages, kwargs)
+            cached = self._call_cache.get(key)
+            if cached is not None:
+                chunks = self._cached_stream(cached)
+
+                def replay() -> ChatResponseGen:
+                    yield from chunks
+
+                return replay()
+        responses = super().stream_chat(messages, **kwargs)
+
+        def gen() -> ChatResponseGen:
+            # the request starts on the first chunk and the slot is held until the stream ends
+            with self._slot(), self._observe(streaming=True) as call:
+                for response in responses:
+                    if call is not None:
+                        if response.delta:
+                            call.first_token()
+                        call.set_usage(response.raw.get('usage'))
+                    self._record_stream(key, response)
+                    yield format_ollama_stream_chunk(response)
+
+        return gen()
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self,
+        messages: Sequence[ChatMessage],
+        **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        """
+        Connector to handle the asynchronous streaming chat requests with Ollama.
+
+        Args:
+            messages (Sequence[ChatMessage]): A sequence of chat messages.
+            **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+            ChatResponseAsyncGen: An async generator of normalized chunks; the last one carries the usage.
+        """
+        key = None
+        if self._call_cache is not None:
+            key = self._call_cache_key(messages, kwargs)
+            cached = self._call_cache.get(key)
+            if cached is not None:
+                chunks = self._cached_stream(cached)
+
+                async def replay() -> ChatResponseAsyncGen:
+                    for chunk in chunks:
+                        yield chunk
+
+                return replay()
+        responses = await super().astream_chat(messages, **kwargs)
+
+        async def gen() -> ChatResponseAsyncGen:
+            async with self._aslot():
+                with self._observe(streaming=True) as call:
+                    async for response in responses:
+                        if call is not None:
+                            if response.delta:
+                                call.first_token()
+                            call.set_usage(response.raw.get('usage'))
+                        self._record_stream(key, response)
+                        yield format_ollama_stream_chunk(response)
+
+        return gen()
+
+    @llm_completion_callback()
+    def stream_complete(
+        self,
+        prompt: str,
+        formatted: bool = False,
+        **kwargs: Any
+    ) -> CompletionResponseGen:
+        """
+        Connector to handle the streaming completion requests with Ollama.
+
+        Args:
+            prompt (str): The input prompt for completion.
+            formatted (bool, optional): Whether the prompt is already formatted. Defaults to False.
+            **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+            CompletionResponseGen: A generator of completion chunks built from the normalized chat stream.
+        """
+        return stream_chat_to_completion_decorator(self.stream_chat)(prompt, **kwargs)
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self,
+        prompt: str,
+        formatted: bool = False,
+        **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        """
+        Connector to handle the asynchronous streaming completion requests with Ollama.
+
+        Args:
+            prompt (str): The input prompt for completion.
+            formatted (bool, optional): Whether the prompt is already formatted. Defaults to False.
+            **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+            CompletionResponseAsyncGen: An async generator of completion chunks built from the normalized chat stream.
+        """
+        return await astream_chat_to_completion_decorator(self.astream_chat)(prompt, **kwargs)
+
 
 if __name__ == "__main__":
     llm = OrpheoOllama(model="llama3.2")
@@ -0,0 +1,156 @@
+from typing import Callable, List, Optional, Sequence
+
+from llama_index.core.base.llms.types import ChatMessage, MessageRole
+from llama_index.core.utils import get_tokenizer
+
+
+DEFAULT_TOKEN_LIMIT = 3000
+# share of token_limit used when counting with the fallback tokenizer rather than the model's
+APPROXIMATE_TOKENIZER_HEADROOM = 0.85
+HISTORY_POLICIES = ("window", "summarize")
+SUMMARIZE_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant.\n"
+    "Keep every fact, name, number and open question that later turns may refer to.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "Turns to fold into the summary:\n{conversation}\n\n"
+    "Updated summary:"
+)
+
+
+class ChatHistory:
+    """
+    Token-bounded chat history with a pinned system prompt.
+
+    Messages are grouped into turns, each starting with a user message, so tool messages are
+    never separated from the assistant message that requested them. When the history exceeds
+    token_limit, the oldest turns are evicted first. The current turn is always kept.
+    - 'window' drops evicted turns.
+    - 'summarize' folds them into a running summary, kept right after the system prompt.
+    Use aappend/aextend from async code: they summarize through achat and do not block the event loop.
+
+    Ollama does not expose its tokenizer. Without one, tokens are counted with llama-index's global
+    tokenizer (tiktoken's cl100k_base), whose counts are close to Llama 3's but not exact, so only
+    APPROXIMATE_TOKENIZER_HEADROOM of token_limit is used.
+
+    Args:
+        system_prompt (str, optional): The system prompt, always sent first. Defaults to None.
+        token_limit (int, optional): Token budget of the whole history. Defaults to DEFAULT_TOKEN_LIMIT.
+        tokenizer (Callable[[str], List], optional): The model's tokenizer. Defaults to the llm's `tokenizer` attribute if it has one, else llama-index's global tokenizer.
+        policy (str, optional): 'window' or 'summarize'. Defaults to 'window'.
+        llm (LLM, optional): The LLM writing the running summary; required by the 'summarize' policy.
+    """
+    def __init__(
+        self,
+        system_prompt: Optional[str] = None,
+        token_limit: int = DEFAULT_TOKEN_LIMIT,
+        tokenizer: Optional[Callable[[str], List]] = None,
+        policy: str = "window",
+        llm=None,
+    ) -> None:
+        if policy not in HISTORY_POLICIES:
+            raise ValueError(f"policy must be one of {HISTORY_POLICIES}, got {policy}")
+        if policy == "summarize" and llm is None:
+            raise ValueError("the 'summarize' policy needs an llm")
+        self.policy = policy
+        self._llm = llm
+        tokenizer = tokenizer or getattr(llm, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = get_tokenizer()
+            token_limit = int(token_limit * APPROXIMATE_TOKENIZER_HEADROOM)
+        self.token_limit = token_limit
+        self._tokenizer = tokenizer
+        self._system = ChatMessage(role=MessageRole.SYSTEM, content=system_prompt) if system_prompt else None
+        self._summary: Optional[str] = None
+        self._summary_message: Optional[ChatMessage] = None
+        self._messages: List[ChatMessage] = []
+        # token counts are computed once per message, not on every trim
+        self._counts: List[int] = []
+
+    def count_tokens(self, message: ChatMessage) -> int:
+        tokens = len(self._tokenizer(message.content or ""))
+        tool_calls = message.additional_kwargs.get("tool_calls")
+        if tool_calls:
+            tokens += len(self._tokenizer(str(tool_calls)))
+        # role and separator overhead of chat templates
+        return tokens + 4
+
+    @property
+    def messages(self) -> List[ChatMessage]:
+        """The history as sent to the LLM: system prompt, running summary, then the kept turns."""
+        pinned = [m for m in (self._system, self._summary_message) if m is not None]
+        return pinned + self._messages
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    @property
+    def total_tokens(self) -> int:
+        pinned = [m for m in (self._system, self._summary_message) if m is not None]
+        return sum(self.count_tokens(m) for m in pinned) + sum(self._counts)
+
+    def append(self, message: ChatMessage) -> None:
+        self._messages.append(message)
+        self._counts.append(self.count_tokens(message))
+        self._trim()
+
+    def extend(self, messages: Sequence[ChatMessage]) -> None:
+        for message in messages:
+            self.append(message)
+
+    async def aappend(self, message: ChatMessage) -> None:
+        """Async version of append; summarizing evicted turns does not block the event loop."""
+        self._messages.append(message)
+        self._counts.append(self.count_tokens(message))
+        evicted = self._evict()
+        if evicted and self.policy == "summarize":
+            self._set_summary((await self._llm.achat([self._summary_prompt(evicted)])).message.content)
+
+    async def aextend(self, messages: Sequence[ChatMessage]) -> None:
+        for message in messages:
+            await self.aappend(message)
+
+    def reset(self) -> None:
+        """Forgets every turn and the running summary; the system prompt stays pinned."""
+        self._messages = []
+        self._counts = []
+        self._summary = None
+        self._summary_message = None
+
+    def _first_turn_end(self) -> Optional[int]:
+        """Index where the second turn starts, or None when only the current turn is left."""
+        for i in range(1, len(self._messages)):
+            if self._messages[i].role == MessageRole.USER:
+                return i
+        return None
+
+    def _evict(self) -> List[ChatMessage]:
+        """Drops the oldest turns until the history fits token_limit and returns their messages."""
+        evicted: List[ChatMessage] = []
+        while self.total_tokens > self.token_limit:
+            end = self._first_turn_end()
+            if end is None:
+                break
+            evicted.extend(self._messages[:end])
+            del self._messages[:end]
+            del self._counts[:end]
+        return evicted
+
+    def _trim(self) -> None:
+        evicted = self._evict()
+        if evicted and self.policy == "summarize":
+            self._set_summary(self._llm.chat([self._summary_prompt(evicted)]).message.content)
+
+    def _summary_prompt(self, evicted: List[ChatMessage]) -> ChatMessage:
+        conversation = "\n".join(f"{m.role.value}: {m.content}" for m in evicted if m.content)
+        prompt = SUMMARIZE_PROMPT.format(summary=self._summary or "(empty)", conversation=conversation)
+        return ChatMessage(role=MessageRole.USER, content=prompt)
+
+    def _set_summary(self, summary: str) -> None:
+        self._summary = summary
+        self._summary_message = ChatMessage(
+            role=MessageRole.SYSTEM,
+            content=f"Summary of the earlier conversation: {self._summary}",
+        )
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_RESPONSE_CACHE_ENTRIES = 1024
+DEFAULT_RESPONSE_CACHE_TTL = 24 * 3600.0
+
+
+class SemanticResponseCache:
+    """
+    In-memory cache of final answers, matched on the embedding similarity of the question.
+
+    Entries live in a scope, eg. (corpus version, video filter): a lookup only compares against
+    entries of its own scope, and retain() drops every scope built on an older corpus version, so
+    an answer never outlives the documents it was computed from. Entries expire after ttl seconds
+    and the least recently used ones are evicted beyond max_entries.
+
+    Args:
+        threshold (float, optional): Minimum cosine similarity for a hit. Defaults to DEFAULT_SIMILARITY_THRESHOLD.
+        max_entries (int, optional): Maximum number of cached answers. Defaults to DEFAULT_RESPONSE_CACHE_ENTRIES.
+        ttl (float, optional): Seconds an answer stays valid; None disables expiry. Defaults to DEFAULT_RESPONSE_CACHE_TTL.
+    """
+    def __init__(
+        self,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_RESPONSE_CACHE_ENTRIES,
+        ttl: Optional[float] = DEFAULT_RESPONSE_CACHE_TTL,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (scope, entry id) -> (unit query vector, query, response, created_at), in LRU order
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._next_id = 0
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def lookup(self, scope: Hashable, query_embedding: Sequence[float]) -> Optional[str]:
+        """
+        Returns the cached answer of the most similar question in scope, or None below threshold.
+
+        Args:
+            scope (Hashable): The scope of the question, eg. (corpus version, video filter).
+            query_embedding (Sequence[float]): The embedding of the question.
+
+        Returns:
+            Optional[str]: The cached answer, or None on a miss.
+        """
+        vector = self._normalize(query_embedding)
+        now = time.time()
+        with self._lock:
+            keys, vectors = [], []
+            for key, (cached, _, _, created_at) in list(self._entries.items()):
+                if self._expired(created_at, now):
+                    del self._entries[key]
+                elif key[0] == scope and cached.shape == vector.shape:
+                    keys.append(key)
+                    vectors.append(cached)
+            if keys:
+                scores = np.stack(vectors) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]][2]
+            self.misses += 1
+            return None
+
+    def put(self, scope: Hashable, query: str, query_embedding: Sequence[float], response: str) -> None:
+        """Stores the answer of query in scope and evicts the least recently used answers beyond max_entries."""
+        with self._lock:
+            self._entries[(scope, self._next_id)] = (self._normalize(query_embedding), query, response, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def retain(self, corpus_version: str) -> None:
+        """Drops every entry whose scope was built on another corpus version; scopes are (corpus version, ...) tuples."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0][0] != corpus_version]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters and the number of cached answers."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
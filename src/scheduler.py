@@ -0,0 +1,246 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Hashable, Optional
+
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_METRICS_WINDOW = 1024
+
+# LLM calls inherit the priority and session of the code that triggered them; anything that did
+# not declare itself interactive (indexing, summaries, metadata extraction) runs in the background
+_request_priority = contextvars.ContextVar("llm_request_priority", default=BACKGROUND)
+_request_session = contextvars.ContextVar("llm_request_session", default=None)
+
+
+@contextmanager
+def llm_request_context(priority: int = INTERACTIVE, session: Optional[Hashable] = None):
+    """
+    Tags every LLM call made inside the block, including those of tools and sub-agents, with a priority and a session.
+
+    Args:
+        priority (int, optional): INTERACTIVE or BACKGROUND. Defaults to INTERACTIVE.
+        session (Hashable, optional): The chat session the calls are made for. Defaults to None.
+    """
+    priority_token = _request_priority.set(priority)
+    session_token = _request_session.set(session)
+    try:
+        yield
+    finally:
+        _request_priority.reset(priority_token)
+        _request_session.reset(session_token)
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a call is refused because the queue is full or it waited longer than queue_timeout."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "session", "enqueued_at", "event", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, priority: int, session: Optional[Hashable]) -> None:
+        self.priority = priority
+        self.session = session
+        self.enqueued_at = time.monotonic()
+        self.event = None
+        self.loop = None
+        self.future = None
+        self.granted = False
+        self.cancelled = False
+
+    def wake(self) -> None:
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Admission queue between the agents and Ollama.
+
+    At most max_in_flight calls reach Ollama at once; it should match the server's
+    OLLAMA_NUM_PARALLEL, since further calls only queue inside Ollama where they cannot be
+    prioritized. Waiting calls are served by priority first (interactive chat turns before
+    background indexing), then fairly across sessions: a call is ranked by how many calls its
+    session already has queued or in flight, so one busy session cannot starve the others.
+    Calls are refused with SchedulerOverloaded once max_queue are waiting, or after waiting
+    queue_timeout seconds, which bounds the tail latency under bursts.
+
+    Args:
+        max_in_flight (int, optional): Concurrent calls sent to Ollama. Defaults to $OLLAMA_NUM_PARALLEL, else DEFAULT_MAX_IN_FLIGHT.
+        max_queue (int, optional): Maximum number of waiting calls. Defaults to DEFAULT_MAX_QUEUE.
+        queue_timeout (float, optional): Maximum seconds a call waits for a slot; None waits forever. Defaults to None.
+        metrics_window (int, optional): Number of recent queue times kept per priority for the percentiles. Defaults to DEFAULT_METRICS_WINDOW.
+    """
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        queue_timeout: Optional[float] = None,
+        metrics_window: int = DEFAULT_METRICS_WINDOW,
+    ) -> None:
+        if max_in_flight is None:
+            max_in_flight = int(os.environ.get("OLLAMA_NUM_PARALLEL") or DEFAULT_MAX_IN_FLIGHT)
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._queued = 0
+        # calls queued or in flight per session, the fairness rank of its next call
+        self._session_load = defaultdict(int)
+        self._queue_times = {priority: deque(maxlen=metrics_window) for priority in PRIORITY_NAMES}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _new_waiter(self, priority: Optional[int], session: Optional[Hashable]) -> _Waiter:
+        return _Waiter(
+            _request_priority.get() if priority is None else priority,
+            _request_session.get() if session is None else session,
+        )
+
+    def _admit(self, waiter: _Waiter) -> None:
+        # lock held
+        self._in_flight += 1
+        self.admitted += 1
+        waiter.granted = True
+        self._queue_times[waiter.priority].append(time.monotonic() - waiter.enqueued_at)
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """Admits waiter right away if a slot is free and nobody is waiting, otherwise queues it; returns whether it was admitted."""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and self._queued == 0:
+                self._session_load[waiter.session] += 1
+                self._admit(waiter)
+                return True
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerOverloaded(f"{self._queued} LLM calls are already waiting")
+            rank = self._session_load[waiter.session]
+            self._session_load[waiter.session] += 1
+            heapq.heappush(self._heap, (waiter.priority, rank, next(self._seq), waiter))
+            self._queued += 1
+            return False
+
+    def _dispatch(self) -> None:
+        # lock held
+        while self._in_flight < self.max_in_flight and self._heap:
+            waiter = heapq.heappop(self._heap)[-1]
+            if waiter.cancelled:
+                continue
+            self._queued -= 1
+            self._admit(waiter)
+            waiter.wake()
+
+    def _forget_session(self, session: Optional[Hashable]) -> None:
+        # lock held
+        self._session_load[session] -= 1
+        if self._session_load[session] <= 0:
+            del self._session_load[session]
+
+    def _release(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._forget_session(waiter.session)
+            self._dispatch()
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Withdraws a waiting call; returns True if it was admitted meanwhile and now holds a slot."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            self._queued -= 1
+            self._forget_session(waiter.session)
+            return False
+
+    def _timed_out(self) -> SchedulerOverloaded:
+        with self._lock:
+            self.timed_out += 1
+        return SchedulerOverloaded(f"no LLM slot was free within {self.queue_timeout}s")
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None, session: Optional[Hashable] = None):
+        """
+        Holds one of the max_in_flight slots for the duration of the block.
+
+        Args:
+            priority (int, optional): INTERACTIVE or BACKGROUND. Defaults to the priority of the current llm_request_context.
+            session (Hashable, optional): The session of the call. Defaults to the session of the current llm_request_context.
+        """
+        waiter = self._new_waiter(priority, session)
+        waiter.event = threading.Event()
+        if not self._enqueue(waiter):
+            if not waiter.event.wait(self.queue_timeout) and not self._abandon(waiter):
+                raise self._timed_out()
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    @asynccontextmanager
+    async def aslot(self, priority: Optional[int] = None, session: Optional[Hashable] = None):
+        """Async version of slot(); waiting for a slot does not block the event loop."""
+        waiter = self._new_waiter(priority, session)
+        waiter.loop = asyncio.get_running_loop()
+        waiter.future = waiter.loop.create_future()
+        if not self._enqueue(waiter):
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise self._timed_out()
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    self._release(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release(waiter)
+
+    @staticmethod
+    def _percentile(values, fraction: float) -> float:
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Returns the current load, the admission counters and the queue-time percentiles (seconds) per priority."""
+        with self._lock:
+            queue_time = {}
+            for priority, name in PRIORITY_NAMES.items():
+                values = sorted(self._queue_times[priority])
+                queue_time[name] = {
+                    "count": len(values),
+                    "mean": sum(values) / len(values) if values else 0.0,
+                    "p50": self._percentile(values, 0.50) if values else 0.0,
+                    "p99": self._percentile(values, 0.99) if values else 0.0,
+                }
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "queue_time": queue_time,
+            }
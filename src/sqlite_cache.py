@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+
+class SQLiteLRUCache:
+    """
+    Key/value cache in one table of a local SQLite file, evicted least-recently-used first.
+
+    Reads bump last_used and writes drop the least recently used rows once the table grows past
+    max_entries. Values are stored as given; subclasses encode and decode them.
+
+    Args:
+        path (str): Location of the SQLite file.
+        table (str): Name of the table holding the entries.
+        value_column (str): Name of the value column.
+        max_entries (int): Maximum number of entries.
+    """
+    def __init__(self, path: str, table: str, value_column: str, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._table = table
+        self._value_column = value_column
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f"key TEXT PRIMARY KEY, {value_column} NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table}(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Returns the stored values of the given keys; missing keys are absent from the result."""
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = list(keys[i:i + 500])
+                rows = self._conn.execute(
+                    f"SELECT key, {self._value_column} FROM {self._table} WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self._table} SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, values: Dict[str, Any]) -> None:
+        """Stores values and evicts the least recently used entries beyond max_entries."""
+        if not values:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self._table} (key, {self._value_column}, last_used) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in values.items()],
+            )
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self._table} WHERE key IN "
+                    f"(SELECT key FROM {self._table} ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many({key: value})
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit/miss counters of this process and the number of stored entries."""
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
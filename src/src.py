@@ -1,15 +1,13 @@
 from agents import YoutubeAgent, ToolCallingAgent
 import os
-from llama_index.embeddings.ollama import OllamaEmbedding
+from embeddings import EmbeddingCache, OrpheoOllamaEmbedding
 from llms import OrpheoOllama
 from llama_index.core import Settings
 import json
 from typing import Callable, List, Sequence
-import nest_asyncio
 from omegaconf import OmegaConf
 from pydantic import BaseModel, Field
 from fastai.imports import *
-nest_asyncio.apply()
 import os
 from llama_index.core import (
     Settings,
@@ -40,9 +38,10 @@ from utils import merge_files, list_all_files, rename_files_remove_spaces
 llm = OrpheoOllama(model="llama3.2", request_timeout=120.0)
 
 
-ollama_embedding = OllamaEmbedding(
+ollama_embedding = OrpheoOllamaEmbedding(
     model_name="llama3.2",
     ollama_additional_kwargs={"mirostat": 0},
+    cache=EmbeddingCache(),
 )
 Settings.llm = llm
 Settings.embed_model = ollama_embedding
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+from typing import Optional, Sequence
+
+from llama_index.core.response_synthesizers import TreeSummarize
+from llama_index.core.schema import BaseNode, MetadataMode
+
+
+SUMMARY_QUERY = (
+    "Write a comprehensive summary of the document titled {title}. Cover every topic, "
+    "guest, claim and conclusion discussed, in the order they appear."
+)
+
+
+def summarize_nodes(title: str, nodes: Sequence[BaseNode], llm) -> str:
+    """
+    Summarizes a document with tree summarization: chunks are summarized in groups that fit the
+    context window, then the partial summaries are summarized again until one answer is left.
+
+    Args:
+        title (str): The document title, used in the summary prompt.
+        nodes (Sequence[BaseNode]): The document chunks, in document order.
+        llm (LLM): The LLM used for every summarization step.
+
+    Returns:
+        str: The document summary.
+    """
+    text_chunks = [node.get_content(metadata_mode=MetadataMode.LLM) for node in nodes]
+    summarizer = TreeSummarize(llm=llm)
+    return str(summarizer.get_response(SUMMARY_QUERY.format(title=title), text_chunks=text_chunks))
+
+
+class DocumentArtifactStore:
+    """
+    Small JSON store of per-document artifacts, eg. summaries, computed at ingest time.
+
+    Every entry remembers the content hash (and any other key parts) it was computed from;
+    get() returns None as soon as they differ, so a changed transcript invalidates its artifacts.
+
+    Args:
+        root (str): Directory holding one JSON file per document.
+    """
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _path(self, title: str) -> str:
+        return os.path.join(self.root, f"{title}.json")
+
+    @staticmethod
+    def make_key(*parts: Optional[str]) -> str:
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, title: str, key: str) -> Optional[str]:
+        """Returns the stored value for title if it was computed for key, otherwise None."""
+        if not os.path.exists(self._path(title)):
+            return None
+        with open(self._path(title)) as f:
+            entry = json.load(f)
+        return entry["value"] if entry.get("key") == key else None
+
+    def put(self, title: str, key: str, value: str) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(title) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "value": value}, f, indent=4)
+        os.replace(tmp_path, self._path(title))
+
+    def remove(self, title: str) -> None:
+        if os.path.exists(self._path(title)):
+            os.remove(self._path(title))
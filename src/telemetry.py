@@ -0,0 +1,383 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from llama_index.core.tools import BaseTool
+from llama_index.core.tools.types import AsyncBaseTool, ToolMetadata, ToolOutput, adapt_to_async_tool
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+
+DEFAULT_METRICS_PORT = 9464
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# the agent and tool a call is made for; set by YoutubeSession and by instrumented tools, read by OrpheoOllama
+_current_agent = contextvars.ContextVar("orpheo_agent", default=None)
+_current_tool = contextvars.ContextVar("orpheo_tool", default=None)
+
+
+class _LLMStats:
+    __slots__ = ("calls", "errors", "prompt_tokens", "completion_tokens", "latency_sum", "latency_buckets", "ttft_sum", "ttft_count")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.ttft_sum = 0.0
+        self.ttft_count = 0
+
+
+class _ToolStats:
+    __slots__ = ("calls", "errors", "latency_sum")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+
+
+class LLMCall:
+    """
+    One LLM request being measured; OrpheoOllama reports the first token and the usage on it.
+
+    Args:
+        span (Span): The OpenTelemetry span of the request.
+    """
+    def __init__(self, span) -> None:
+        self.span = span
+        self.agent = _current_agent.get()
+        self.tool = _current_tool.get()
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def set_usage(self, usage: Optional[Dict[str, int]]) -> None:
+        """Takes the token counts from the `usage` block Ollama responses carry."""
+        if not usage:
+            return
+        self.prompt_tokens = usage.get("prompt_tokens", 0)
+        self.completion_tokens = usage.get("completion_tokens", 0)
+
+
+class Telemetry:
+    """
+    Token and latency metrics of the LLM calls and tool calls of the agents.
+
+    Every LLM call is tagged with the agent (eg. top_agent, agent_expert_in_document_<title>) and
+    the tool (eg. vector_tool_<title>) it was made for, and recorded twice: as an OpenTelemetry
+    span, nested under the spans of its agent and tool, and in in-process counters that can be read
+    with snapshot(), dumped as JSON or scraped in the Prometheus text format from serve().
+    Spans are only exported once an OpenTelemetry SDK tracer provider is configured, see setup_tracing.
+
+    Args:
+        tracer_name (str, optional): Name of the OpenTelemetry tracer. Defaults to "orpheo".
+    """
+    def __init__(self, tracer_name: str = "orpheo") -> None:
+        self._tracer = trace.get_tracer(tracer_name)
+        self._lock = threading.Lock()
+        self._llm: Dict[tuple, _LLMStats] = {}
+        self._tools: Dict[tuple, _ToolStats] = {}
+
+    @contextmanager
+    def agent(self, name: str):
+        """Tags the LLM calls made inside the block with agent name."""
+        agent_token = _current_agent.set(name)
+        tool_token = _current_tool.set(None)
+        try:
+            with self._tracer.start_as_current_span(f"agent {name}", attributes={"orpheo.agent": name}):
+                yield
+        finally:
+            _current_agent.reset(agent_token)
+            _current_tool.reset(tool_token)
+
+    @contextmanager
+    def tool(self, name: str, is_agent: bool = False):
+        """
+        Counts one call of tool name and tags the LLM calls made inside the block with it.
+
+        Args:
+            name (str): The tool name.
+            is_agent (bool, optional): Whether the tool runs a sub-agent, whose calls are then tagged with the tool name as their agent. Defaults to False.
+        """
+        key = (_current_agent.get() or "", name)
+        agent_token = _current_agent.set(name) if is_agent else None
+        tool_token = _current_tool.set(None if is_agent else name)
+        started = time.perf_counter()
+        failed = False
+        try:
+            with self._tracer.start_as_current_span(
+                f"tool {name}",
+                attributes={"orpheo.agent": key[0], "orpheo.tool": name},
+            ):
+                yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_tool.reset(tool_token)
+            if agent_token is not None:
+                _current_agent.reset(agent_token)
+            with self._lock:
+                stats = self._tools.setdefault(key, _ToolStats())
+                stats.calls += 1
+                stats.errors += failed
+                stats.latency_sum += time.perf_counter() - started
+
+    @contextmanager
+    def llm_call(self, model: str, streaming: bool = False):
+        """
+        Measures one request to Ollama; yields an LLMCall to report the first token and the usage on.
+
+        The span is started without being made current, so it can safely outlive the caller's frame,
+        eg. in a streaming generator consumed by another task.
+
+        Args:
+            model (str): The model name.
+            streaming (bool, optional): Whether the response is streamed. Defaults to False.
+        """
+        span = self._tracer.start_span(
+            "llm.chat",
+            attributes={
+                "gen_ai.system": "ollama",
+                "gen_ai.request.model": model,
+                "orpheo.streaming": streaming,
+            },
+        )
+        call = LLMCall(span)
+        failed = False
+        try:
+            yield call
+        except BaseException as e:
+            failed = True
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            raise
+        finally:
+            self._record(model, call, failed)
+
+    def _record(self, model: str, call: LLMCall, failed: bool) -> None:
+        latency = time.perf_counter() - call.started
+        ttft = call.first_token_at - call.started if call.first_token_at is not None else None
+        call.span.set_attributes({
+            "orpheo.agent": call.agent or "",
+            "orpheo.tool": call.tool or "",
+            "gen_ai.usage.input_tokens": call.prompt_tokens,
+            "gen_ai.usage.output_tokens": call.completion_tokens,
+            "orpheo.latency_s": latency,
+        })
+        if ttft is not None:
+            call.span.set_attribute("orpheo.ttft_s", ttft)
+        call.span.end()
+        with self._lock:
+            stats = self._llm.setdefault((call.agent or "", call.tool or "", model), _LLMStats())
+            stats.calls += 1
+            stats.errors += failed
+            stats.prompt_tokens += call.prompt_tokens
+            stats.completion_tokens += call.completion_tokens
+            stats.latency_sum += latency
+            stats.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            if ttft is not None:
+                stats.ttft_sum += ttft
+                stats.ttft_count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns every counter, per (agent, tool, model) for LLM calls and per (agent, tool) for tool calls."""
+        with self._lock:
+            return {
+                "llm": [
+                    {
+                        "agent": agent,
+                        "tool": tool,
+                        "model": model,
+                        "calls": stats.calls,
+                        "errors": stats.errors,
+                        "prompt_tokens": stats.prompt_tokens,
+                        "completion_tokens": stats.completion_tokens,
+                        "latency_sum": stats.latency_sum,
+                        "latency_mean": stats.latency_sum / stats.calls if stats.calls else 0.0,
+                        "ttft_mean": stats.ttft_sum / stats.ttft_count if stats.ttft_count else None,
+                    }
+                    for (agent, tool, model), stats in self._llm.items()
+                ],
+                "tools": [
+                    {
+                        "agent": agent,
+                        "tool": tool,
+                        "calls": stats.calls,
+                        "errors": stats.errors,
+                        "latency_sum": stats.latency_sum,
+                    }
+                    for (agent, tool), stats in self._tools.items()
+                ],
+            }
+
+    def dump_json(self, path: str) -> None:
+        """Writes snapshot() to path."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._llm.clear()
+            self._tools.clear()
+
+    @staticmethod
+    def _labels(**labels: str) -> str:
+        escaped = []
+        for key, value in labels.items():
+            value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    def prometheus_text(self) -> str:
+        """Renders the counters in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            llm = list(self._llm.items())
+            tools = list(self._tools.items())
+
+        for name, attr, help_text in (
+            ("orpheo_llm_calls_total", "calls", "LLM requests sent to Ollama."),
+            ("orpheo_llm_errors_total", "errors", "LLM requests that failed."),
+            ("orpheo_llm_prompt_tokens_total", "prompt_tokens", "Prompt tokens processed by Ollama."),
+            ("orpheo_llm_completion_tokens_total", "completion_tokens", "Completion tokens generated by Ollama."),
+        ):
+            family(name, "counter", help_text)
+            for (agent, tool, model), stats in llm:
+                lines.append(f"{name}{self._labels(agent=agent, tool=tool, model=model)} {getattr(stats, attr)}")
+
+        family("orpheo_llm_latency_seconds", "histogram", "Total latency of LLM requests.")
+        for (agent, tool, model), stats in llm:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.latency_buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"orpheo_llm_latency_seconds_bucket{self._labels(agent=agent, tool=tool, model=model, le=le)} {cumulative}")
+            labels = self._labels(agent=agent, tool=tool, model=model)
+            lines.append(f"orpheo_llm_latency_seconds_sum{labels} {stats.latency_sum}")
+            lines.append(f"orpheo_llm_latency_seconds_count{labels} {stats.calls}")
+
+        family("orpheo_llm_ttft_seconds", "summary", "Time to first token of streamed LLM requests.")
+        for (agent, tool, model), stats in llm:
+            labels = self._labels(agent=agent, tool=tool, model=model)
+            lines.append(f"orpheo_llm_ttft_seconds_sum{labels} {stats.ttft_sum}")
+            lines.append(f"orpheo_llm_ttft_seconds_count{labels} {stats.ttft_count}")
+
+        family("orpheo_tool_calls_total", "counter", "Tool calls made by the agents.")
+        for (agent, tool), stats in tools:
+            lines.append(f"orpheo_tool_calls_total{self._labels(agent=agent, tool=tool)} {stats.calls}")
+        family("orpheo_tool_errors_total", "counter", "Tool calls that failed.")
+        for (agent, tool), stats in tools:
+            lines.append(f"orpheo_tool_errors_total{self._labels(agent=agent, tool=tool)} {stats.errors}")
+        family("orpheo_tool_latency_seconds", "summary", "Latency of tool calls, including their LLM calls.")
+        for (agent, tool), stats in tools:
+            labels = self._labels(agent=agent, tool=tool)
+            lines.append(f"orpheo_tool_latency_seconds_sum{labels} {stats.latency_sum}")
+            lines.append(f"orpheo_tool_latency_seconds_count{labels} {stats.calls}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = DEFAULT_METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serves /metrics (Prometheus text format) and /metrics.json on a background thread.
+
+        Args:
+            port (int, optional): The port to listen on. Defaults to DEFAULT_METRICS_PORT.
+            host (str, optional): The interface to listen on. Defaults to 127.0.0.1.
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop it.
+        """
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = telemetry.prometheus_text().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(telemetry.snapshot()).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class InstrumentedTool(AsyncBaseTool):
+    """
+    Tool wrapper that records each call of the wrapped tool with Telemetry.tool().
+
+    Args:
+        tool (BaseTool): The wrapped tool.
+        telemetry (Telemetry): Where the calls are recorded.
+        is_agent (bool, optional): Whether the tool runs a sub-agent. Defaults to False.
+    """
+
+    def __init__(self, tool: BaseTool, telemetry: Telemetry, is_agent: bool = False) -> None:
+        self._tool = adapt_to_async_tool(tool)
+        self._telemetry = telemetry
+        self._is_agent = is_agent
+
+    @property
+    def metadata(self) -> ToolMetadata:
+        return self._tool.metadata
+
+    def call(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        with self._telemetry.tool(self.metadata.name, is_agent=self._is_agent):
+            return self._tool.call(*args, **kwargs)
+
+    async def acall(self, *args: Any, **kwargs: Any) -> ToolOutput:
+        with self._telemetry.tool(self.metadata.name, is_agent=self._is_agent):
+            return await self._tool.acall(*args, **kwargs)
+
+
+def setup_tracing(service_name: str = "orpheo", endpoint: Optional[str] = None) -> None:
+    """
+    Installs an OpenTelemetry SDK tracer provider exporting spans over OTLP/HTTP.
+
+    Args:
+        service_name (str, optional): The service.name resource attribute. Defaults to "orpheo".
+        endpoint (str, optional): The OTLP traces endpoint. Defaults to $OTEL_EXPORTER_OTLP_TRACES_ENDPOINT, else the exporter's default.
+    """
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint) if endpoint else OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
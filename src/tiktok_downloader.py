@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 import webbrowser
 from datetime import datetime
 from pathlib import Path
@@ -9,6 +8,7 @@ import urllib.parse
 from threading import Thread
 from dotenv import load_dotenv
 from typing import Optional, Dict, List
+from http_session import PlatformSession, get_session
 
 class OAuthCallbackHandler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -30,8 +30,10 @@ class OAuthCallbackHandler(BaseHTTPRequestHandler):
         return
 
 class TikTokDownloader:
-    def __init__(self):
+    def __init__(self, session: Optional[PlatformSession] = None):
         load_dotenv()
+        # pooled, rate limited and retried transport shared by every TikTokDownloader
+        self.session = session or get_session('tiktok')
         self.client_key = os.getenv('TIKTOK_CLIENT_KEY')
         self.client_secret = os.getenv('TIKTOK_CLIENT_SECRET')
         self.redirect_uri = "http://localhost:8000/"
@@ -101,7 +103,7 @@ class TikTokDownloader:
             if server.oauth_code:
                 # Exchange code for access token
                 print("Authenticating...")
-                response = requests.post(
+                response = self.session.post(
                     "https://open.tiktokapis.com/v2/oauth/token",
                     data={
                         'client_key': self.client_key,
@@ -138,7 +140,7 @@ class TikTokDownloader:
             'Content-Type': 'application/json'
         }
         
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers)
         return response.json()
 
     def get_user_videos(self, cursor: str = None) -> Dict:
@@ -157,19 +159,19 @@ class TikTokDownloader:
         if cursor:
             params['cursor'] = cursor
         
-        response = requests.get(url, headers=headers, params=params)
+        response = self.session.get(url, headers=headers, params=params)
         return response.json()
 
     def download_video(self, video_url: str, output_path: str) -> bool:
         """Download video from URL"""
         try:
-            response = requests.get(video_url, stream=True)
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                return True
+            with self.session.get(video_url, stream=True) as response:
+                if response.status_code == 200:
+                    with open(output_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=8192):
+                            if chunk:
+                                f.write(chunk)
+                    return True
         except Exception as e:
             print(f"Error downloading video: {str(e)}")
         return False
@@ -1,16 +1,29 @@
 import chainlit as cl
 from utils import merge_files, list_all_files, rename_files_remove_spaces
-from agents import YoutubeAgent, ToolCallingAgent
+from agents import AgentRegistry, YoutubeAgent, ToolCallingAgent
 import os
-from llama_index.embeddings.ollama import OllamaEmbedding
+from embeddings import EmbeddingCache, OrpheoOllamaEmbedding
+from response_cache import SemanticResponseCache
 from llms import OrpheoOllama
+from scheduler import LLMScheduler
+from telemetry import Telemetry, setup_tracing
 from llama_index.core import Settings
 
-def init(query: str):
-    llm = OrpheoOllama(model="llama3.2", request_timeout=120.0)
-    ollama_embedding = OllamaEmbedding(
+YOUTUBE_AGENT_KEY = "youtube"
+registry = AgentRegistry()
+telemetry = Telemetry()
+
+
+def build_youtube_agent() -> YoutubeAgent:
+    """Builds the shared YoutubeAgent. Runs once per process, not once per message."""
+    if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT") or os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"):
+        # the exporter reads the endpoint from the environment; installed first so that indexing is traced too
+        setup_tracing()
+    llm = OrpheoOllama(model="llama3.2", request_timeout=120.0, scheduler=LLMScheduler(), telemetry=telemetry)
+    ollama_embedding = OrpheoOllamaEmbedding(
         model_name="llama3.2",
         ollama_additional_kwargs={"mirostat": 0},
+        cache=EmbeddingCache(),
     )
     Settings.llm = llm
     Settings.embed_model = ollama_embedding
@@ -32,13 +45,52 @@ def init(query: str):
 
     output_file = "merged_output.txt"
     # merge_files(directory_path, output_file)
-            
-    summary_agent = YoutubeAgent(system_prompt=system_prompt,in_dir=directory_path,llm=llm, embedding=ollama_embedding, out_dir="./results/youtube")
+
+    summary_agent = YoutubeAgent(system_prompt=system_prompt,in_dir=directory_path,llm=llm, embedding=ollama_embedding, out_dir="./results/youtube", response_cache=SemanticResponseCache(), telemetry=telemetry)
     summary_agent.update_files()
-    agent = summary_agent.get_top_agent()
-    response = agent.chat(query)
+    if os.environ.get("ORPHEO_METRICS_PORT"):
+        # Prometheus scrape target, also serving /metrics.json
+        telemetry.serve(port=int(os.environ["ORPHEO_METRICS_PORT"]))
+    return summary_agent
+
+
+def get_youtube_agent() -> YoutubeAgent:
+    return registry.get(YOUTUBE_AGENT_KEY, build_youtube_agent)
+
+
+def get_session():
+    """Returns this chat session's wrapper, creating it on first use."""
+    session = cl.user_session.get("youtube_session")
+    if session is None:
+        session = get_youtube_agent().new_session()
+        cl.user_session.set("youtube_session", session)
+    return session
+
+
+async def aget_session():
+    """Async version of get_session(); building the shared agent runs in a worker thread, not on the event loop."""
+    session = cl.user_session.get("youtube_session")
+    if session is None:
+        youtube_agent = await cl.make_async(get_youtube_agent)()
+        session = youtube_agent.new_session()
+        cl.user_session.set("youtube_session", session)
+    return session
 
-    return response
+
+def init(query: str):
+    response = get_session().chat(query)
+    return str(response)
+
+
+def stream(query: str):
+    """Returns the streaming response of query; iterate response_gen for the answer tokens."""
+    return get_session().stream_chat(query)
+
+
+async def astream(query: str):
+    """Async version of stream(); iterate async_response_gen() for the answer tokens."""
+    session = await aget_session()
+    return session, await session.astream_chat(query)
 
 
 @cl.set_starters
@@ -69,17 +121,28 @@ async def set_starters():
 
 
 
+@cl.on_chat_start
+async def start():
+    await aget_session()
+
+
 @cl.step(type="tool")
-async def Orpheo(query: str):
+async def Orpheo(query: str, answer: cl.Message):
     await cl.sleep(0.5)
-    return init(query)
+    session, response = await astream(query)
+    # forward the final answer as Ollama produces it instead of waiting for the whole text
+    async for token in response.async_response_gen():
+        await answer.stream_token(token)
+    session.cache_answer(answer.content)
+    return answer.content
 
 
 @cl.on_message
 async def main(message: cl.Message):
-    # Call the tool
-    tool_res = await Orpheo(message.content)
+    answer = cl.Message(content="")
 
-    # Send the final answer.
-    await cl.Message(content=tool_res).send()
+    # Call the tool, streaming its answer into the message
+    await Orpheo(message.content, answer)
 
+    # Send the final answer.
+    await answer.send()
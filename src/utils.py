@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 def list_all_files(directory):
@@ -72,3 +73,19 @@ def rename_files_remove_spaces(directory):
                 except OSError as e:
                     print(f"Error renaming file {old_path}: {e}")
                     
+
+
+
+def hash_file(file_path, chunk_size=1 << 20):
+    """
+    Computes the sha256 hex digest of a file's content.
+
+    Args:
+        file_path (str): Path to the file to hash
+        chunk_size (int): Number of bytes read per iteration
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,525 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.constants import DATA_KEY
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+
+
+DEFAULT_NAMESPACE = "default"
+VECTOR_STORE_PREFIX = "vector_store"
+MATRIX_SUFFIX = ".npy"
+TABLE_SUFFIX = ".meta.json"
+NODES_SUFFIX = ".nodes.sqlite"
+CENTROIDS_SUFFIX = ".ivf.npy"
+ASSIGNMENTS_SUFFIX = ".lists.npy"
+QUERY_BLOCK_ROWS = 65536
+IVF_MIN_ROWS = 4096
+IVF_DEFAULT_PROBE = 8
+IVF_TRAIN_ITERATIONS = 10
+IVF_SAMPLE_PER_LIST = 64
+
+
+def _store_base_path(persist_dir: str, namespace: str = DEFAULT_NAMESPACE) -> str:
+    return os.path.join(persist_dir, f"{namespace}__{VECTOR_STORE_PREFIX}")
+
+
+def _node_json(node: BaseNode) -> str:
+    # the side table holds the metadata and the matrix the embedding; only the rest of the node is stored
+    data = doc_to_json(node)
+    data[DATA_KEY].pop("metadata", None)
+    data[DATA_KEY]["embedding"] = None
+    return json.dumps(data)
+
+
+def _normalize_rows(block: np.ndarray) -> np.ndarray:
+    return block / np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+
+
+class MemmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store that keeps all embeddings in one contiguous NumPy matrix.
+
+    On disk the matrix is a .npy file that is loaded with np.load(mmap_mode="r"), so opening a
+    store costs a few page faults instead of a full JSON parse. Node ids, ref doc ids and metadata
+    live in a small JSON side table next to it. Similarity search is a blockwise matrix product
+    over the whole matrix.
+
+    The store also keeps the nodes themselves (stores_text), so indexes over it need no docstore:
+    the text, relationships and other node fields are rows of a SQLite table, read only for the
+    nodes a query returns, and the side table is the only copy of the metadata.
+
+    Once a store grows past IVF_MIN_ROWS rows, persist() also trains an inverted-file (IVF) index:
+    a spherical k-means over the rows, with each row assigned to its nearest centroid. Queries then
+    only score the rows of the ivf_probe closest lists, which keeps a corpus-wide store over
+    thousands of videos fast without any dependency beyond NumPy.
+
+    Metadata filters are evaluated on integer-coded NumPy columns, built once per metadata key,
+    so a filtered query selects its rows with np.isin instead of a Python pass over every row.
+
+    Args:
+        dtype (str, optional): Storage dtype of the matrix, "float32" or "float16". Defaults to "float32".
+        ivf_lists (int, optional): Number of IVF lists. None picks sqrt(rows), 0 disables the IVF index. Defaults to None.
+        ivf_probe (int, optional): Number of lists scored per query. Defaults to IVF_DEFAULT_PROBE.
+    """
+    stores_text: bool = True
+    dtype: str = "float32"
+    ivf_lists: Optional[int] = None
+    ivf_probe: int = IVF_DEFAULT_PROBE
+
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[Optional[str]] = PrivateAttr(default_factory=list)
+    _metadata: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+    _matrix: Optional[np.ndarray] = PrivateAttr(default=None)
+    _pending: List[List[float]] = PrivateAttr(default_factory=list)
+    _norms: Optional[np.ndarray] = PrivateAttr(default=None)
+    _centroids: Optional[np.ndarray] = PrivateAttr(default=None)
+    _assignments: Optional[np.ndarray] = PrivateAttr(default=None)
+    _trained_rows: int = PrivateAttr(default=0)
+    # metadata key -> (code of every row, value -> code)
+    _columns: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    # the persisted nodes are read from _nodes_path; nodes added or removed since are applied by persist()
+    _nodes_path: Optional[str] = PrivateAttr(default=None)
+    _nodes_conn: Optional[sqlite3.Connection] = PrivateAttr(default=None)
+    _nodes_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _added_nodes: Dict[str, str] = PrivateAttr(default_factory=dict)
+    _removed_ids: set = PrivateAttr(default_factory=set)
+
+    def __init__(
+        self,
+        dtype: str = "float32",
+        ivf_lists: Optional[int] = None,
+        ivf_probe: int = IVF_DEFAULT_PROBE,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(dtype=dtype, ivf_lists=ivf_lists, ivf_probe=ivf_probe, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MemmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The embedding matrix, with rows in the same order as node_ids."""
+        self._consolidate()
+        return self._matrix
+
+    @property
+    def node_ids(self) -> List[str]:
+        return self._ids
+
+    @property
+    def metadata(self) -> List[Dict[str, Any]]:
+        return self._metadata
+
+    def _node_rows(self, node_ids: Iterable[str]) -> Dict[str, str]:
+        """Returns the stored JSON of the given nodes, from the nodes added since the last persist or the SQLite table."""
+        found, missing = {}, []
+        for node_id in node_ids:
+            if node_id in self._added_nodes:
+                found[node_id] = self._added_nodes[node_id]
+            else:
+                missing.append(node_id)
+        if missing and self._nodes_path is not None:
+            with self._nodes_lock:
+                if self._nodes_conn is None:
+                    self._nodes_conn = sqlite3.connect(self._nodes_path, check_same_thread=False)
+                for i in range(0, len(missing), 500):
+                    batch = missing[i:i + 500]
+                    found.update(self._nodes_conn.execute(
+                        f"SELECT node_id, node FROM nodes WHERE node_id IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall())
+        return found
+
+    def _nodes(self, rows: Sequence[int]) -> List[BaseNode]:
+        node_rows = self._node_rows([self._ids[row] for row in rows])
+        nodes = []
+        for row in rows:
+            node = json_to_doc(json.loads(node_rows[self._ids[row]]))
+            node.metadata = dict(self._metadata[row])
+            nodes.append(node)
+        return nodes
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        """Returns the stored nodes, in insertion order, optionally restricted to node_ids and filters."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        if node_ids is not None:
+            node_ids = set(node_ids)
+            mask &= np.fromiter((node_id in node_ids for node_id in self._ids), dtype=bool, count=len(self._ids))
+        if filters is not None:
+            mask &= self._filter_mask(filters)
+        return self._nodes(np.flatnonzero(mask))
+
+    def _consolidate(self) -> None:
+        if not self._pending:
+            return
+        pending = np.asarray(self._pending, dtype=self.dtype)
+        if self._matrix is None or len(self._matrix) == 0:
+            self._matrix = pending
+        else:
+            self._matrix = np.concatenate([np.asarray(self._matrix), pending])
+        if self._centroids is not None:
+            self._assignments = np.concatenate([self._assignments, self._assign(pending)])
+        self._pending = []
+        self._norms = None
+
+    def _assign(self, matrix: np.ndarray) -> np.ndarray:
+        """Returns the nearest IVF list of every row of matrix."""
+        assignments = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), QUERY_BLOCK_ROWS):
+            block = _normalize_rows(np.asarray(matrix[start:start + QUERY_BLOCK_ROWS], dtype=np.float32))
+            assignments[start:start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        return assignments
+
+    def train_ivf(self, n_lists: Optional[int] = None) -> None:
+        """
+        Trains the IVF index with a spherical k-means over a sample of the rows.
+
+        Args:
+            n_lists (int, optional): Number of lists. Defaults to ivf_lists, or sqrt(rows) when that is None.
+        """
+        self._consolidate()
+        n_rows = len(self._ids)
+        n_lists = min(n_lists or self.ivf_lists or int(np.sqrt(n_rows)), n_rows)
+        if n_lists < 1:
+            return
+        rng = np.random.default_rng(0)
+        sample_size = min(n_rows, n_lists * IVF_SAMPLE_PER_LIST)
+        sample_rows = np.sort(rng.choice(n_rows, size=sample_size, replace=False))
+        sample = _normalize_rows(np.asarray(self._matrix[sample_rows], dtype=np.float32))
+        centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            filled = np.bincount(labels, minlength=n_lists) > 0
+            # empty lists keep their previous centroid
+            centroids[filled] = _normalize_rows(sums[filled])
+        self._centroids = centroids
+        self._assignments = self._assign(self._matrix)
+        self._trained_rows = n_rows
+
+    def _column(self, key: str):
+        """Returns the integer codes of metadata[key] for every row and the code of each value."""
+        if key not in self._columns:
+            vocab = {}
+            codes = np.fromiter(
+                (vocab.setdefault(meta.get(key), len(vocab)) for meta in self._metadata),
+                dtype=np.int32,
+                count=len(self._metadata),
+            )
+            self._columns[key] = (codes, vocab)
+        return self._columns[key]
+
+    def _filter_mask(self, filters: MetadataFilters) -> np.ndarray:
+        """Returns a boolean mask of the rows matching filters."""
+        masks = []
+        for f in filters.filters:
+            if isinstance(f, MetadataFilters):
+                masks.append(self._filter_mask(f))
+                continue
+            codes, vocab = self._column(f.key)
+            if f.operator in (FilterOperator.EQ, FilterOperator.NE):
+                mask = codes == vocab.get(f.value, -1)
+                masks.append(mask if f.operator == FilterOperator.EQ else ~mask)
+            elif f.operator in (FilterOperator.IN, FilterOperator.NIN):
+                mask = np.isin(codes, [vocab[value] for value in f.value if value in vocab])
+                masks.append(mask if f.operator == FilterOperator.IN else ~mask)
+            else:
+                raise ValueError(f"Unsupported filter operator: {f.operator}")
+        if not masks:
+            return np.ones(len(self._ids), dtype=bool)
+        if filters.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        return np.logical_and.reduce(masks)
+
+    def _maybe_train_ivf(self) -> None:
+        n_rows = len(self._ids)
+        if self.ivf_lists == 0 or n_rows < IVF_MIN_ROWS:
+            self._centroids = None
+            self._assignments = None
+            return
+        # retrain once the store doubled since the last training, otherwise new rows reuse the old lists
+        if self._centroids is None or n_rows >= 2 * self._trained_rows:
+            self.train_ivf()
+
+    def _row_norms(self) -> np.ndarray:
+        if self._norms is None:
+            self._norms = np.empty(len(self._matrix), dtype=np.float32)
+            for start in range(0, len(self._matrix), QUERY_BLOCK_ROWS):
+                block = np.asarray(self._matrix[start:start + QUERY_BLOCK_ROWS], dtype=np.float32)
+                self._norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        return self._norms
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        for node in nodes:
+            self._ids.append(node.node_id)
+            self._ref_doc_ids.append(node.ref_doc_id)
+            self._metadata.append(dict(node.metadata))
+            self._pending.append(node.get_embedding())
+            self._added_nodes[node.node_id] = _node_json(node)
+            self._removed_ids.discard(node.node_id)
+        self._columns = {}
+        return [node.node_id for node in nodes]
+
+    def _keep_rows(self, keep: np.ndarray) -> None:
+        self._consolidate()
+        for node_id, k in zip(self._ids, keep):
+            if not k:
+                self._added_nodes.pop(node_id, None)
+                self._removed_ids.add(node_id)
+        self._ids = [node_id for node_id, k in zip(self._ids, keep) if k]
+        self._ref_doc_ids = [ref for ref, k in zip(self._ref_doc_ids, keep) if k]
+        self._metadata = [meta for meta, k in zip(self._metadata, keep) if k]
+        if self._matrix is not None:
+            self._matrix = np.asarray(self._matrix)[keep]
+        if self._assignments is not None:
+            self._assignments = self._assignments[keep]
+        self._norms = None
+        self._columns = {}
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        keep = np.array([ref != ref_doc_id for ref in self._ref_doc_ids], dtype=bool)
+        if not keep.all():
+            self._keep_rows(keep)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        if node_ids is not None and len(node_ids) == 0:
+            return
+        matched = np.ones(len(self._ids), dtype=bool)
+        if node_ids:
+            node_ids = set(node_ids)
+            matched &= np.fromiter((node_id in node_ids for node_id in self._ids), dtype=bool, count=len(self._ids))
+        if filters is not None:
+            matched &= self._filter_mask(filters)
+        keep = ~matched
+        if not keep.all():
+            self._keep_rows(keep)
+
+    def _candidate_rows(self, query: VectorStoreQuery) -> Optional[np.ndarray]:
+        """Returns the row indices allowed by the query's filters, or None when every row is allowed."""
+        # VectorStoreIndex passes the node ids of its index struct, which is empty over a store keeping the nodes
+        if query.filters is None and not query.doc_ids and not query.node_ids:
+            return None
+        mask = np.ones(len(self._ids), dtype=bool)
+        if query.filters is not None:
+            mask &= self._filter_mask(query.filters)
+        if query.doc_ids:
+            doc_ids = set(query.doc_ids)
+            mask &= np.fromiter((ref in doc_ids for ref in self._ref_doc_ids), dtype=bool, count=len(self._ids))
+        if query.node_ids:
+            node_ids = set(query.node_ids)
+            mask &= np.fromiter((node_id in node_ids for node_id in self._ids), dtype=bool, count=len(self._ids))
+        return np.flatnonzero(mask)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"MemmapVectorStore only supports the default query mode, got {query.mode}")
+        self._consolidate()
+        if self._matrix is None or len(self._ids) == 0 or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        rows = self._candidate_rows(query)
+        q = np.asarray(query.query_embedding, dtype=np.float32)
+        q_norm = np.linalg.norm(q) or 1.0
+        norms = self._row_norms()
+        # the IVF lists are trained by persist(), never on the query path
+        if self._centroids is not None:
+            probe = min(self.ivf_probe, len(self._centroids))
+            lists = np.argpartition(-(self._centroids @ (q / q_norm)), probe - 1)[:probe]
+            in_lists = np.isin(self._assignments, lists)
+            probed = np.flatnonzero(in_lists) if rows is None else rows[in_lists[rows]]
+            # fall back to an exact scan when the probed lists cannot fill top_k
+            if len(probed) >= query.similarity_top_k:
+                rows = probed
+        if rows is None:
+            scores = np.empty(len(self._matrix), dtype=np.float32)
+            for start in range(0, len(self._matrix), QUERY_BLOCK_ROWS):
+                block = np.asarray(self._matrix[start:start + QUERY_BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ q
+            scores /= np.maximum(norms, 1e-12) * q_norm
+            rows = np.arange(len(scores))
+        else:
+            if len(rows) == 0:
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            block = np.asarray(self._matrix[rows], dtype=np.float32)
+            scores = (block @ q) / (np.maximum(norms[rows], 1e-12) * q_norm)
+
+        k = min(query.similarity_top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return VectorStoreQueryResult(
+            nodes=self._nodes([rows[i] for i in top]),
+            similarities=[float(scores[i]) for i in top],
+            ids=[self._ids[rows[i]] for i in top],
+        )
+
+    def persist(self, persist_path: str, fs: Optional[Any] = None) -> None:
+        """
+        Writes the matrix and side table next to persist_path.
+
+        StorageContext.persist passes the path of the legacy JSON file, eg. <dir>/default__vector_store.json;
+        the binary store is written to <dir>/default__vector_store.npy and <dir>/default__vector_store.meta.json,
+        and the nodes to <dir>/default__vector_store.nodes.sqlite.
+        """
+        self._consolidate()
+        base_path = os.path.splitext(persist_path)[0]
+        os.makedirs(os.path.dirname(base_path) or ".", exist_ok=True)
+        self._maybe_train_ivf()
+        nodes_path = base_path + NODES_SUFFIX
+        if nodes_path != self._nodes_path:
+            # a new location gets every node; stale rows of an older store there are dropped below
+            added = self._node_rows(self._ids)
+        else:
+            added = self._added_nodes
+        conn = sqlite3.connect(nodes_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, node TEXT NOT NULL)")
+        # new nodes are written before the side table that lists them, removed ones deleted after it
+        conn.executemany("INSERT OR REPLACE INTO nodes (node_id, node) VALUES (?, ?)", list(added.items()))
+        conn.commit()
+        matrix = self._matrix if self._matrix is not None else np.zeros((0, 0), dtype=self.dtype)
+        # write through temporary files so that a reader mapping the old matrix is never torn
+        with open(base_path + MATRIX_SUFFIX + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=self.dtype))
+        if self._centroids is not None:
+            with open(base_path + CENTROIDS_SUFFIX + ".tmp", "wb") as f:
+                np.save(f, self._centroids)
+            with open(base_path + ASSIGNMENTS_SUFFIX + ".tmp", "wb") as f:
+                np.save(f, self._assignments)
+        with open(base_path + TABLE_SUFFIX + ".tmp", "w") as f:
+            json.dump(
+                {
+                    "dtype": self.dtype,
+                    "ivf_lists": self.ivf_lists,
+                    "ivf_probe": self.ivf_probe,
+                    "ivf_trained_rows": self._trained_rows if self._centroids is not None else 0,
+                    "ids": self._ids,
+                    "ref_doc_ids": self._ref_doc_ids,
+                    "metadata": self._metadata,
+                },
+                f,
+            )
+        os.replace(base_path + MATRIX_SUFFIX + ".tmp", base_path + MATRIX_SUFFIX)
+        if self._centroids is not None:
+            os.replace(base_path + CENTROIDS_SUFFIX + ".tmp", base_path + CENTROIDS_SUFFIX)
+            os.replace(base_path + ASSIGNMENTS_SUFFIX + ".tmp", base_path + ASSIGNMENTS_SUFFIX)
+        os.replace(base_path + TABLE_SUFFIX + ".tmp", base_path + TABLE_SUFFIX)
+        if nodes_path != self._nodes_path:
+            ids = set(self._ids)
+            removed = [node_id for (node_id,) in conn.execute("SELECT node_id FROM nodes") if node_id not in ids]
+        else:
+            removed = list(self._removed_ids)
+        conn.executemany("DELETE FROM nodes WHERE node_id = ?", [(node_id,) for node_id in removed])
+        conn.commit()
+        conn.close()
+        with self._nodes_lock:
+            if self._nodes_conn is not None:
+                self._nodes_conn.close()
+            self._nodes_conn = None
+            self._nodes_path = nodes_path
+        self._added_nodes = {}
+        self._removed_ids = set()
+
+    @classmethod
+    def exists(cls, persist_dir: str, namespace: str = DEFAULT_NAMESPACE) -> bool:
+        return os.path.exists(_store_base_path(persist_dir, namespace) + TABLE_SUFFIX)
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, namespace: str = DEFAULT_NAMESPACE) -> "MemmapVectorStore":
+        """Opens a persisted store, memory-mapping its matrix read-only."""
+        base_path = _store_base_path(persist_dir, namespace)
+        with open(base_path + TABLE_SUFFIX) as f:
+            table = json.load(f)
+        store = cls(
+            dtype=table["dtype"],
+            ivf_lists=table.get("ivf_lists"),
+            ivf_probe=table.get("ivf_probe", IVF_DEFAULT_PROBE),
+        )
+        store._ids = table["ids"]
+        store._ref_doc_ids = table["ref_doc_ids"]
+        store._metadata = table["metadata"]
+        store._nodes_path = base_path + NODES_SUFFIX
+        store._matrix = np.load(base_path + MATRIX_SUFFIX, mmap_mode="r") if store._ids else None
+        if table.get("ivf_trained_rows"):
+            store._centroids = np.load(base_path + CENTROIDS_SUFFIX)
+            store._assignments = np.load(base_path + ASSIGNMENTS_SUFFIX)
+            store._trained_rows = table["ivf_trained_rows"]
+        return store
+
+    @classmethod
+    def from_simple_vector_store(
+        cls,
+        simple_store: SimpleVectorStore,
+        docstore: SimpleDocumentStore,
+        dtype: str = "float32",
+    ) -> "MemmapVectorStore":
+        """Converts a legacy SimpleVectorStore and the docstore holding its nodes, eg. loaded from default__vector_store.json and docstore.json."""
+        nodes = []
+        for node_id, embedding in simple_store.data.embedding_dict.items():
+            node = docstore.get_node(node_id)
+            node.embedding = embedding
+            nodes.append(node)
+        store = cls(dtype=dtype)
+        store.add(nodes)
+        return store
+
+
+def build_vector_index(
+    nodes: Sequence[BaseNode],
+    persist_dir: str,
+    dtype: str = "float32",
+    ivf_lists: Optional[int] = None,
+    **kwargs: Any,
+) -> VectorStoreIndex:
+    """Builds a VectorStoreIndex over nodes backed by a MemmapVectorStore and persists it."""
+    storage_context = StorageContext.from_defaults(vector_store=MemmapVectorStore(dtype=dtype, ivf_lists=ivf_lists))
+    index = VectorStoreIndex(nodes, storage_context=storage_context, **kwargs)
+    index.storage_context.persist(persist_dir=persist_dir)
+    return index
+
+
+def load_vector_index(persist_dir: str, **kwargs: Any) -> VectorStoreIndex:
+    """
+    Loads an index persisted by build_vector_index.
+
+    Only the vector store's side table is parsed; the nodes stay in SQLite until a query returns
+    them, so neither docstore.json nor index_store.json are read. Directories still holding a JSON
+    SimpleVectorStore are converted to the binary format on the fly: their nodes move from
+    docstore.json into the store and the legacy JSON vector store file is removed.
+    """
+    legacy_path = os.path.join(persist_dir, f"{DEFAULT_NAMESPACE}__{VECTOR_STORE_PREFIX}.json")
+    if MemmapVectorStore.exists(persist_dir):
+        return VectorStoreIndex.from_vector_store(MemmapVectorStore.from_persist_dir(persist_dir), **kwargs)
+
+    vector_store = MemmapVectorStore.from_simple_vector_store(
+        SimpleVectorStore.from_persist_path(legacy_path),
+        SimpleDocumentStore.from_persist_dir(persist_dir),
+    )
+    index = VectorStoreIndex.from_vector_store(vector_store, **kwargs)
+    # overwrites docstore.json and index_store.json with the empty ones of an index over a text-storing store
+    index.storage_context.persist(persist_dir=persist_dir)
+    os.remove(legacy_path)
+    return index
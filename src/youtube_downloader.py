@@ -1,18 +1,187 @@
+import hashlib
 import os
 import pickle
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import google_auth_httplib2
+import httplib2
+import requests
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from pytube import YouTube
 from datetime import datetime
 import json
 
+# videos().list accepts at most 50 ids per request
+VIDEOS_LIST_MAX_IDS = 50
+# pages listed ahead of the details being fetched
+PAGE_PREFETCH = 2
+# seconds the listing thread waits on a full queue before checking whether the consumer stopped
+PAGE_PUT_TIMEOUT = 1.0
+DEFAULT_DOWNLOAD_WORKERS = 4
+# byte range requested per call, the same as pytube's
+DOWNLOAD_RANGE_SIZE = 9 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 30
+RETRY_QUEUE_FILE = 'retry_queue.json'
+VIDEO_STORE_FILE = 'videos.sqlite'
+
+
+class VideoMetadataStore:
+    """SQLite store of the channel's video resources, keyed by video id.
+
+    Every row keeps the resource etag, publishedAt and a hash of its snippet and contentDetails.
+    updated_at is set when a video is first stored or when that hash changes, so downstream
+    indexing can ask for changed_since(timestamp) without loading the whole channel. Statistics
+    live in their own column and never move updated_at, since view and like counts change all
+    the time. A small key/value table keeps sync state, eg. etags."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS videos ("
+            "video_id TEXT PRIMARY KEY, etag TEXT NOT NULL, published_at TEXT, "
+            "data TEXT NOT NULL, statistics TEXT, content_hash TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, synced_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_updated_at ON videos(updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS videos_published_at ON videos(published_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def content_hash(video):
+        """Hash of the snippet and contentDetails of a video resource, ie. everything but its statistics."""
+        payload = json.dumps([video.get('snippet'), video.get('contentDetails')], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _statistics(video):
+        return json.dumps(video['statistics']) if 'statistics' in video else None
+
+    @staticmethod
+    def _decode(data, statistics):
+        video = json.loads(data)
+        if statistics is not None:
+            video['statistics'] = json.loads(statistics)
+        return video
+
+    def upsert_many(self, videos):
+        """Insert or update video resources; returns the ids that were new or whose content changed.
+        Resources fetched without statistics keep the stored ones."""
+        now = time.time()
+        hashes = {video['id']: self.content_hash(video) for video in videos}
+        with self._lock:
+            stored = self._content_hashes(list(hashes))
+            changed = [video_id for video_id, content_hash in hashes.items() if stored.get(video_id) != content_hash]
+            self._conn.executemany(
+                "INSERT INTO videos (video_id, etag, published_at, data, statistics, content_hash, updated_at, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET etag = excluded.etag, published_at = excluded.published_at, "
+                "data = excluded.data, statistics = COALESCE(excluded.statistics, videos.statistics), "
+                "content_hash = excluded.content_hash, synced_at = excluded.synced_at, "
+                "updated_at = CASE WHEN videos.content_hash = excluded.content_hash "
+                "THEN videos.updated_at ELSE excluded.updated_at END",
+                [
+                    (
+                        video['id'], video['etag'], video['snippet'].get('publishedAt'),
+                        json.dumps({key: value for key, value in video.items() if key != 'statistics'}),
+                        self._statistics(video), hashes[video['id']], now, now,
+                    )
+                    for video in videos
+                ],
+            )
+            self._conn.commit()
+        return changed
+
+    def update_statistics(self, videos):
+        """Store the statistics of video resources fetched with part="statistics"; updated_at is left as is."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE videos SET statistics = ? WHERE video_id = ?",
+                [(self._statistics(video), video['id']) for video in videos if 'statistics' in video],
+            )
+            self._conn.commit()
+
+    def _content_hashes(self, video_ids):
+        hashes = {}
+        for i in range(0, len(video_ids), 500):
+            batch = video_ids[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT video_id, content_hash FROM videos WHERE video_id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            hashes.update(rows)
+        return hashes
+
+    def video_ids(self):
+        """Ids of every stored video, oldest first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT video_id FROM videos ORDER BY published_at, video_id").fetchall()
+        return [video_id for (video_id,) in rows]
+
+    def get(self, video_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data, statistics FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return self._decode(*row) if row else None
+
+    def changed_since(self, timestamp):
+        """Video resources stored or modified after timestamp (seconds since the epoch), oldest change first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data, statistics FROM videos WHERE updated_at > ? ORDER BY updated_at", (timestamp,)
+            ).fetchall()
+        return [self._decode(*row) for row in rows]
+
+    def get_state(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_state(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, json.dumps(value))
+            )
+            self._conn.commit()
+
+    def prune_state(self, prefix, keep):
+        """Delete the state keys starting with prefix that are not in keep."""
+        with self._lock:
+            keys = [key for (key,) in self._conn.execute(
+                "SELECT key FROM sync_state WHERE key LIKE ?", (prefix + '%',)
+            ).fetchall()]
+            self._conn.executemany(
+                "DELETE FROM sync_state WHERE key = ?", [(key,) for key in keys if key not in keep]
+            )
+            self._conn.commit()
+
+    def export_json(self, path):
+        """Write every stored video resource to path, in the format of videos_metadata.json."""
+        with self._lock:
+            rows = self._conn.execute("SELECT data, statistics FROM videos ORDER BY published_at DESC").fetchall()
+        with open(path, 'w') as f:
+            json.dump([self._decode(*row) for row in rows], f, indent=4)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 class YouTubeChannelDownloader:
     def __init__(self, client_secrets_file):
         self.client_secrets_file = client_secrets_file
         self.credentials = None
         self.youtube = None
         self.SCOPES = ['https://www.googleapis.com/auth/youtube.readonly']
+        self._channel_info = None
         
     def authenticate(self):
         """Handle OAuth2 authentication flow."""
@@ -33,34 +202,77 @@ class YouTubeChannelDownloader:
 
         self.youtube = build('youtube', 'v3', credentials=self.credentials)
 
-    def get_channel_info(self):
-        """Get basic information about the authenticated user's channel."""
-        request = self.youtube.channels().list(
-            part="snippet,contentDetails,statistics",
-            mine=True
-        )
-        response = request.execute()
-        return response['items'][0]
+    def get_channel_info(self, refresh=False, http=None):
+        """Get basic information about the authenticated user's channel.
+        The response is cached; pass refresh=True to fetch it again, eg. for up to date statistics."""
+        if self._channel_info is None or refresh:
+            request = self.youtube.channels().list(
+                part="snippet,contentDetails,statistics",
+                mine=True
+            )
+            response = request.execute(http=http)
+            self._channel_info = response['items'][0]
+        return self._channel_info
 
-    def get_all_videos(self, max_results=None):
-        """Get all videos from the channel."""
-        videos = []
-        request = self.youtube.search().list(
-            part="snippet",
-            channelId=self.get_channel_info()['id'],
-            maxResults=50,
-            type="video",
-            order="date"
-        )
-        
-        while request and (max_results is None or len(videos) < max_results):
-            response = request.execute()
-            videos.extend(response['items'])
-            request = self.youtube.search().list_next(request, response)
-            
+    @staticmethod
+    def video_id(item):
+        """Video id of a search result or of an uploads playlist item."""
+        if 'contentDetails' in item and 'videoId' in item['contentDetails']:
+            return item['contentDetails']['videoId']
+        return item['id']['videoId']
+
+    def _thread_http(self):
+        """Authorized HTTP connection for a worker thread; httplib2 connections must not be shared across threads."""
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+
+    def iter_video_pages(self, max_results=None, http=None, source="uploads", known_ids=None):
+        """Yield the channel videos one result page at a time, newest first.
+
+        source selects the listing:
+        - 'uploads' pages playlistItems().list over the channel's uploads playlist: 1 quota unit per page, no cap.
+        - 'search' pages search().list: 100 quota units per page, capped at about 500 results.
+        With known_ids, listing stops at the first video already in it, so a refresh only lists the new uploads."""
+        if source == "uploads":
+            resource = self.youtube.playlistItems()
+            uploads = self.get_channel_info(http=http)['contentDetails']['relatedPlaylists']['uploads']
+            request = resource.list(
+                part="snippet,contentDetails",
+                playlistId=uploads,
+                maxResults=50
+            )
+        elif source == "search":
+            resource = self.youtube.search()
+            request = resource.list(
+                part="snippet",
+                channelId=self.get_channel_info(http=http)['id'],
+                maxResults=50,
+                type="video",
+                order="date"
+            )
+        else:
+            raise ValueError(f"source must be 'uploads' or 'search', got {source}")
+
+        count = 0
+        while request and (max_results is None or count < max_results):
+            response = request.execute(http=http)
+            items = response['items']
             if max_results:
-                videos = videos[:max_results]
-                
+                items = items[:max_results - count]
+            if known_ids:
+                for i, item in enumerate(items):
+                    if self.video_id(item) in known_ids:
+                        if i:
+                            yield items[:i]
+                        return
+            count += len(items)
+            yield items
+            request = resource.list_next(request, response)
+
+    def get_all_videos(self, max_results=None, source="uploads", known_ids=None):
+        """Get all videos from the channel, see iter_video_pages for source and known_ids."""
+        videos = []
+        for items in self.iter_video_pages(max_results, source=source, known_ids=known_ids):
+            videos.extend(items)
         return videos
 
     def get_video_details(self, video_id):
@@ -71,47 +283,285 @@ class YouTubeChannelDownloader:
         )
         return request.execute()['items'][0]
 
-    def download_video(self, video_id, output_path):
-        """Download a specific video."""
+    def get_videos_details(self, video_ids):
+        """Get detailed information about many videos, 50 ids per request.
+        Videos the API no longer returns (deleted or private) are left out."""
+        details = []
+        for i in range(0, len(video_ids), VIDEOS_LIST_MAX_IDS):
+            batch = video_ids[i:i + VIDEOS_LIST_MAX_IDS]
+            response = self.youtube.videos().list(
+                part="snippet,contentDetails,statistics",
+                id=",".join(batch)
+            ).execute()
+            by_id = {item['id']: item for item in response['items']}
+            details.extend(by_id[video_id] for video_id in batch if video_id in by_id)
+        return details
+
+    def iter_video_details(self, max_results=None, source="uploads", known_ids=None):
+        """Yield detailed information about every channel video, see iter_video_pages for source and known_ids.
+        Result pages are listed on a background thread while the details of the previous
+        pages are fetched, in batches of 50 ids, on the calling thread. The listing thread stops
+        once the generator is closed, eg. when the consumer breaks out early or raises."""
+        pages = queue.Queue(maxsize=PAGE_PREFETCH)
+        stop = threading.Event()
+        done = object()
+        # fetched here so that the listing thread finds it cached
+        self.get_channel_info()
+
+        def put(item):
+            """Queue item unless the consumer stopped; returns whether it was queued."""
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=PAGE_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def list_pages():
+            try:
+                for items in self.iter_video_pages(max_results, http=self._thread_http(), source=source, known_ids=known_ids):
+                    if not put(items):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        threading.Thread(target=list_pages, daemon=True).start()
+        pending = []
+        try:
+            while True:
+                items = pages.get()
+                if items is done:
+                    break
+                if isinstance(items, Exception):
+                    raise items
+                pending.extend(self.video_id(video) for video in items)
+                while len(pending) >= VIDEOS_LIST_MAX_IDS:
+                    yield from self.get_videos_details(pending[:VIDEOS_LIST_MAX_IDS])
+                    pending = pending[VIDEOS_LIST_MAX_IDS:]
+            if pending:
+                yield from self.get_videos_details(pending)
+        finally:
+            stop.set()
+
+    def download_video(self, video_id, output_path, progress=None):
+        """Download a specific video.
+        A file already on disk with the expected size is skipped, and a partial download left
+        in <file>.part by an earlier run is resumed from where it stopped.
+        progress, if given, is called as progress(video_id, downloaded_bytes, total_bytes)."""
         try:
             video_url = f"https://www.youtube.com/watch?v={video_id}"
             yt = YouTube(video_url)
             stream = yt.streams.get_highest_resolution()
-            stream.download(output_path=output_path)
+            file_path = os.path.join(output_path, stream.default_filename)
+            total = stream.filesize
+            if os.path.isfile(file_path) and os.path.getsize(file_path) == total:
+                return True
+
+            part_path = file_path + '.part'
+            downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if downloaded > total:
+                downloaded = 0
+            with open(part_path, 'ab' if downloaded else 'wb') as f:
+                while downloaded < total:
+                    stop = min(downloaded + DOWNLOAD_RANGE_SIZE, total) - 1
+                    with requests.get(f"{stream.url}&range={downloaded}-{stop}", stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                        response.raise_for_status()
+                        received = 0
+                        for chunk in response.iter_content(chunk_size=1024 * 1024):
+                            f.write(chunk)
+                            received += len(chunk)
+                            downloaded += len(chunk)
+                            if progress:
+                                progress(video_id, downloaded, total)
+                    if received == 0:
+                        raise IOError(f"empty response at byte {downloaded} of {total}")
+            os.replace(part_path, file_path)
             return True
         except Exception as e:
             print(f"Error downloading video {video_id}: {str(e)}")
             return False
 
+    @staticmethod
+    def _load_retry_queue(retry_file):
+        if os.path.exists(retry_file):
+            with open(retry_file) as f:
+                return json.load(f)
+        return []
+
+    @staticmethod
+    def _save_retry_queue(retry_file, video_ids):
+        tmp_path = retry_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(video_ids, f, indent=4)
+        os.replace(tmp_path, retry_file)
+
+    def download_videos(self, video_ids, output_path, workers=DEFAULT_DOWNLOAD_WORKERS, retry_file=None, progress=None):
+        """Download many videos on a pool of worker threads.
+        Videos that fail are written to the retry queue (output_path/retry_queue.json by default)
+        and removed from it once they succeed, see retry_failed_downloads.
+        Without a progress callback, each worker prints its progress every 10%.
+        Returns the ids of the videos that failed."""
+        os.makedirs(output_path, exist_ok=True)
+        retry_file = retry_file or os.path.join(output_path, RETRY_QUEUE_FILE)
+        if progress is None:
+            progress = self._print_progress()
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download') as executor:
+            futures = {
+                executor.submit(self.download_video, video_id, output_path, progress): video_id
+                for video_id in video_ids
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                video_id = futures[future]
+                ok = future.result()
+                if not ok:
+                    failed.append(video_id)
+                print(f"[{i}/{len(futures)}] {video_id} {'done' if ok else 'failed'}")
+
+        attempted = set(video_ids)
+        retry_queue = [video_id for video_id in self._load_retry_queue(retry_file) if video_id not in attempted]
+        retry_queue.extend(failed)
+        self._save_retry_queue(retry_file, retry_queue)
+        return failed
+
+    def retry_failed_downloads(self, output_path, workers=DEFAULT_DOWNLOAD_WORKERS, retry_file=None):
+        """Download again every video of the retry queue; returns the ids that failed again."""
+        retry_file = retry_file or os.path.join(output_path, RETRY_QUEUE_FILE)
+        return self.download_videos(self._load_retry_queue(retry_file), output_path, workers=workers, retry_file=retry_file)
+
+    @staticmethod
+    def _print_progress():
+        reported = {}
+        lock = threading.Lock()
+
+        def progress(video_id, downloaded, total):
+            percent = int(100 * downloaded / total) if total else 100
+            with lock:
+                if percent // 10 == reported.get(video_id, -1):
+                    return
+                reported[video_id] = percent // 10
+            worker = threading.current_thread().name
+            print(f"[{worker}] {video_id}: {percent}% ({downloaded / 1e6:.1f}/{total / 1e6:.1f} MB)")
+
+        return progress
+
+    @staticmethod
+    def _execute_conditional(request, etag):
+        """Execute request with If-None-Match; returns None when the API answers 304 Not Modified."""
+        if etag:
+            request.headers['If-None-Match'] = etag
+        try:
+            return request.execute()
+        except HttpError as e:
+            if e.resp.status == 304:
+                return None
+            raise
+
+    def _sync_channel_info(self, store):
+        # statistics would change the etag on every sync, so they are fetched apart, unconditionally
+        request = self.youtube.channels().list(
+            part="snippet,contentDetails",
+            mine=True
+        )
+        response = self._execute_conditional(request, store.get_state('channel_etag'))
+        if response is None:
+            channel_info = store.get_state('channel_info')
+        else:
+            channel_info = response['items'][0]
+            store.set_state('channel_etag', response['etag'])
+            store.set_state('channel_info', channel_info)
+        statistics = self.youtube.channels().list(part="statistics", mine=True).execute()['items'][0]
+        self._channel_info = dict(channel_info, statistics=statistics['statistics'])
+        return self._channel_info
+
+    def sync_channel(self, output_dir, download_videos=False, refresh_existing=True, refresh_statistics=False):
+        """Incrementally sync the channel into output_dir/videos.sqlite.
+
+        Only uploads newer than the newest stored video are listed. When refresh_existing is set,
+        the stored videos are then re-checked in batches of 50 ids: each batch is requested with
+        the etag of its previous response, and a 304 Not Modified answer skips it at no data cost.
+        The re-check leaves statistics out, whose view and like counts would change the etag of
+        almost every batch; refresh_statistics re-fetches them, without an etag, in a separate pass.
+        A video counts as changed only when its snippet or contentDetails did. See
+        VideoMetadataStore.changed_since for the downstream query.
+        Returns the ids of the new or changed videos."""
+        os.makedirs(output_dir, exist_ok=True)
+        store = VideoMetadataStore(os.path.join(output_dir, VIDEO_STORE_FILE))
+        try:
+            channel_info = self._sync_channel_info(store)
+            with open(os.path.join(output_dir, 'channel_info.json'), 'w') as f:
+                json.dump(channel_info, f, indent=4)
+
+            known_ids = set(store.video_ids())
+            changed = store.upsert_many(list(self.iter_video_details(known_ids=known_ids)))
+            print(f"{len(changed)} new videos")
+
+            if refresh_existing:
+                ordered = [video_id for video_id in store.video_ids() if video_id in known_ids]
+                batch_keys = set()
+                for i in range(0, len(ordered), VIDEOS_LIST_MAX_IDS):
+                    # oldest first, so that the batches of old videos stay the same from one sync to the next
+                    batch = ordered[i:i + VIDEOS_LIST_MAX_IDS]
+                    batch_key = 'batch_etag:' + hashlib.sha256(",".join(batch).encode('utf-8')).hexdigest()
+                    batch_keys.add(batch_key)
+                    request = self.youtube.videos().list(
+                        part="snippet,contentDetails",
+                        id=",".join(batch)
+                    )
+                    response = self._execute_conditional(request, store.get_state(batch_key))
+                    if response is None:
+                        continue
+                    updated = store.upsert_many(response['items'])
+                    store.set_state(batch_key, response['etag'])
+                    if updated:
+                        print(f"{len(updated)} changed videos in batch {i // VIDEOS_LIST_MAX_IDS + 1}")
+                    changed.extend(updated)
+                store.prune_state('batch_etag:', batch_keys)
+
+            if refresh_statistics:
+                ordered = [video_id for video_id in store.video_ids() if video_id in known_ids]
+                for i in range(0, len(ordered), VIDEOS_LIST_MAX_IDS):
+                    response = self.youtube.videos().list(
+                        part="statistics",
+                        id=",".join(ordered[i:i + VIDEOS_LIST_MAX_IDS])
+                    ).execute()
+                    store.update_statistics(response['items'])
+
+            store.set_state('last_sync', time.time())
+        finally:
+            store.close()
+
+        if download_videos and changed:
+            self.download_videos(changed, os.path.join(output_dir, 'videos'))
+        return changed
+
     def download_channel_data(self, output_dir, download_videos=False):
         """Download all channel data and optionally videos."""
         os.makedirs(output_dir, exist_ok=True)
         
         # Get and save channel info
-        channel_info = self.get_channel_info()
+        channel_info = self.get_channel_info(refresh=True)
         with open(os.path.join(output_dir, 'channel_info.json'), 'w') as f:
             json.dump(channel_info, f, indent=4)
         
         # Get and save all videos metadata
-        videos = self.get_all_videos()
         videos_data = []
         videos_dir = os.path.join(output_dir, 'videos')
         
-        if download_videos:
-            os.makedirs(videos_dir, exist_ok=True)
-        
-        for video in videos:
-            video_id = video['id']['videoId']
-            video_details = self.get_video_details(video_id)
+        for video_details in self.iter_video_details():
             videos_data.append(video_details)
-            
-            if download_videos:
-                self.download_video(video_id, videos_dir)
         
         # Save all video metadata
         with open(os.path.join(output_dir, 'videos_metadata.json'), 'w') as f:
             json.dump(videos_data, f, indent=4)
 
+        if download_videos:
+            self.download_videos([video['id'] for video in videos_data], videos_dir)
+
 def main():
     # Replace with path to your client secrets file
     CLIENT_SECRETS_FILE = "client_secrets.json"